@@ -0,0 +1,122 @@
+"""
+Streaming exports of the stored timetables (CSV, JSON, XLSX).
+
+Rows are read with chunked .iterator() queries and written out one at a
+time, so exporting every class runs in constant memory.
+"""
+import csv
+import json
+from datetime import time
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, When, IntegerField
+from class_timetable_v2.models import ClassTimetableEntry as ClassTimetableEntryV2
+from class_timetable_v2.utils import CLASS_CONFIG as CLASS_CONFIG_V2
+from timetable.models import AcademicClass, TimetableEntry
+from .models import ClassTimetableEntry, DAYS
+from .utils import CLASS_CONFIG
+
+EXPORT_CHUNK_SIZE = 2000
+
+CLASS_COLUMNS = ['class', 'day', 'start_time', 'end_time', 'batch', 'subject', 'teacher', 'room']
+ACADEMIC_COLUMNS = ['class', 'day', 'start_time', 'end_time', 'batch', 'subject_code', 'subject', 'room', 'is_break', 'is_extra']
+
+def day_order():
+    return Case(*[When(day=day, then=i) for i, (day, _) in enumerate(DAYS)], output_field=IntegerField())
+
+def class_timetable_rows(model, class_key=None):
+    entries = model.objects.all()
+    if class_key:
+        entries = entries.filter(class_key=class_key)
+    entries = entries.order_by('class_key', day_order(), 'start_time', 'batch')
+    return entries.values_list(
+        'class_key', 'day', 'start_time', 'end_time', 'batch', 'subject_name', 'teacher_name', 'room'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+def academic_timetable_rows(class_id=None):
+    entries = TimetableEntry.objects.all()
+    if class_id:
+        entries = entries.filter(academic_class_id=class_id)
+    entries = entries.order_by('academic_class_id', 'day_id', 'time_slot__start_time', 'batch__name')
+    return entries.values_list(
+        'academic_class__name', 'day__name', 'time_slot__start_time', 'time_slot__end_time',
+        'batch__name', 'subject__code', 'subject__name', 'room__room_number', 'is_break', 'is_extra'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+# source: (columns, rows(class) where class is a class key / AcademicClass id)
+EXPORT_SOURCES = {
+    'class_timetable': (CLASS_COLUMNS, lambda key=None: class_timetable_rows(ClassTimetableEntry, key)),
+    'class_timetable_v2': (CLASS_COLUMNS, lambda key=None: class_timetable_rows(ClassTimetableEntryV2, key)),
+    'timetable': (ACADEMIC_COLUMNS, academic_timetable_rows),
+}
+
+def export_class(source, value):
+    """
+    The class filter of an export from user input: a class key, or an
+    AcademicClass id for 'timetable'. Raises ValueError if it names no
+    class, so a typo is reported instead of exporting nothing.
+    """
+    if not value:
+        return None
+    if source == 'timetable':
+        if not value.isdigit() or not AcademicClass.objects.filter(pk=int(value)).exists():
+            raise ValueError(f"Unknown AcademicClass id '{value}'")
+        return int(value)
+    config = CLASS_CONFIG_V2 if source == 'class_timetable_v2' else CLASS_CONFIG
+    if value not in config:
+        raise ValueError(f"Unknown class '{value}'")
+    return value
+
+def export_rows(source, class_key=None):
+    """
+    (columns, row iterator) of a source; times are written as 'HH:MM'.
+    """
+    columns, rows = EXPORT_SOURCES[source]
+    return columns, (
+        [value.strftime('%H:%M') if isinstance(value, time) else value for value in row]
+        for row in rows(class_key)
+    )
+
+class Echo:
+    """
+    File-like object whose write() returns the line, so csv.writer output
+    can be yielded instead of buffered.
+    """
+    def write(self, value):
+        return value
+
+def csv_chunks(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+def json_chunks(columns, rows):
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder)
+        separator = ',\n'
+    yield '\n]\n'
+
+def write_xlsx(columns, rows, output):
+    """
+    Writes the rows to `output` (a path or binary file) as a workbook.
+    XLSX is a zip archive, so it cannot be streamed while it is written;
+    constant_memory mode flushes each row to disk instead of keeping it.
+    Requires xlsxwriter.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Timetable')
+    worksheet.write_row(0, 0, columns, workbook.add_format({'bold': True}))
+    for i, row in enumerate(rows, start=1):
+        worksheet.write_row(i, 0, row)
+    workbook.close()
+
+# format: (content type, chunk generator); 'xlsx' is written by write_xlsx
+EXPORT_FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'json': ('application/json', json_chunks),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', None),
+}
@@ -0,0 +1,127 @@
+"""
+iCalendar feeds of the class timetables.
+
+The weekly timetable is expanded into one event per lecture on every
+semester date (CLASS_TIMETABLE_SEMESTER_START .. _END), skipping
+CLASS_TIMETABLE_HOLIDAYS. Feeds are generated as a stream of lines and
+the finished output is cached until the timetables change.
+"""
+import hashlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import ClassTimetableEntry
+from .teachers import PLACEHOLDER_TEACHERS
+
+def semester_dates():
+    """
+    Teaching dates of the semester, holidays excluded.
+    """
+    start = date.fromisoformat(settings.CLASS_TIMETABLE_SEMESTER_START)
+    end = date.fromisoformat(settings.CLASS_TIMETABLE_SEMESTER_END)
+    holidays = {date.fromisoformat(d) for d in getattr(settings, 'CLASS_TIMETABLE_HOLIDAYS', [])}
+    day = start
+    while day <= end:
+        if day not in holidays:
+            yield day
+        day += timedelta(days=1)
+
+def feed_cache_key(*parts):
+    # Includes the semester settings, so changing them invalidates feeds
+    # in shared caches too
+    semester = (
+        settings.CLASS_TIMETABLE_SEMESTER_START,
+        settings.CLASS_TIMETABLE_SEMESTER_END,
+        sorted(getattr(settings, 'CLASS_TIMETABLE_HOLIDAYS', [])),
+    )
+    fingerprint = hashlib.md5(repr(semester).encode()).hexdigest()[:8]
+    return ':'.join(['class_timetable:ical', fingerprint, *map(str, parts)])
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\n', '\\n')
+    )
+
+def fold(line):
+    """
+    Content line folded at 75 octets (RFC 5545 3.1).
+    """
+    data = line.encode('utf-8')
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    parts.append(data.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+def utc_stamp(day, t):
+    local = timezone.make_aware(datetime.combine(day, t))
+    return local.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+def feed_lines(name, entries, class_names=None):
+    """
+    Yields the lines of a VCALENDAR with one VEVENT per entry and semester
+    date. class_names ({class_key: name}) prefixes each summary with the
+    class, for feeds spanning several classes.
+    """
+    by_day = {}
+    for entry in entries:
+        by_day.setdefault(entry.day, []).append(entry)
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield 'PRODID:-//Opti-Time//Class Timetable//EN\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    yield fold(f"X-WR-CALNAME:{escape_text(name)}")
+    for day in semester_dates():
+        for entry in by_day.get(day.strftime('%A'), []):
+            summary = entry.subject_name
+            if entry.batch != 'ALL':
+                summary = f"{summary} ({entry.batch})"
+            if class_names:
+                summary = f"{class_names[entry.class_key]}: {summary}"
+            uid = f"{entry.class_key}-{entry.batch}-{day:%Y%m%d}-{entry.start_time:%H%M}@opti-time"
+
+            yield 'BEGIN:VEVENT\r\n'
+            yield fold(f"UID:{uid}")
+            yield f"DTSTAMP:{stamp}\r\n"
+            yield f"DTSTART:{utc_stamp(day, entry.start_time)}\r\n"
+            yield f"DTEND:{utc_stamp(day, entry.end_time)}\r\n"
+            yield fold(f"SUMMARY:{escape_text(summary)}")
+            if entry.teacher_name not in PLACEHOLDER_TEACHERS:
+                yield fold(f"DESCRIPTION:{escape_text(entry.teacher_name)}")
+            if entry.room:
+                yield fold(f"LOCATION:{escape_text(entry.room)}")
+            yield 'END:VEVENT\r\n'
+    yield 'END:VCALENDAR\r\n'
+
+def class_feed_entries(class_key, batch=None):
+    """
+    Rows of a class feed; a batch feed has the batch's practicals plus the
+    whole-class lectures.
+    """
+    entries = ClassTimetableEntry.objects.filter(class_key=class_key)
+    if batch:
+        entries = entries.filter(batch__in=[batch, 'ALL'])
+    return list(entries.order_by('start_time', 'batch'))
+
+def teacher_feed_entries(teacher):
+    return list(ClassTimetableEntry.objects.filter(teacher=teacher).order_by('start_time', 'class_key'))
+
+def cached_stream(key, lines):
+    """
+    Yields the lines and caches their concatenation once the stream is
+    complete (an aborted download caches nothing).
+    """
+    chunks = []
+    for line in lines:
+        chunks.append(line)
+        yield line
+    cache.set(key, ''.join(chunks), getattr(settings, 'CLASS_TIMETABLE_CALENDAR_CACHE_TIMEOUT', 3600))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from class_timetable.exports import EXPORT_SOURCES, EXPORT_FORMATS, export_class, export_rows, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Exports stored timetables as CSV, JSON or XLSX, streaming rows in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', choices=list(EXPORT_SOURCES))
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--class', dest='class_key', help="Class key (or AcademicClass id for 'timetable'); all classes if omitted")
+        parser.add_argument('--output', '-o', help="Output file; stdout if omitted (not for xlsx)")
+
+    def handle(self, *args, **options):
+        try:
+            class_key = export_class(options['source'], options['class_key'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        columns, rows = export_rows(options['source'], class_key)
+        _, chunks = EXPORT_FORMATS[options['format']]
+        output = options['output']
+
+        if chunks is None:
+            if not output:
+                raise CommandError("XLSX exports need --output")
+            try:
+                write_xlsx(columns, rows, output)
+            except ImportError:
+                raise CommandError("XLSX export requires xlsxwriter")
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                f.writelines(chunks(columns, rows))
+        else:
+            sys.stdout.writelines(chunks(columns, rows))
+
+        if output:
+            self.stdout.write(self.style.SUCCESS(f"Exported to {output}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from class_timetable.models import ClassTimetableEntry
+from class_timetable.teachers import link_teachers
+from class_timetable.utils import CLASS_CONFIG
+
+
+class Command(BaseCommand):
+    help = "Links inputs and timetable rows to Teachers, merging spelling variants of teacher names"
+
+    def handle(self, *args, **options):
+        models = [cfg['input'] for cfg in CLASS_CONFIG.values()] + [ClassTimetableEntry]
+        spellings = link_teachers(models)
+
+        for teacher, names in sorted(spellings.items(), key=lambda item: item[0].name):
+            if len(names) > 1:
+                self.stdout.write(f"Merged {teacher.name}: {', '.join(sorted(names))}")
+        self.stdout.write(self.style.SUCCESS(f"{len(spellings)} teachers linked"))
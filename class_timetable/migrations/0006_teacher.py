@@ -0,0 +1,79 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:25
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of class_timetable.teachers as of this migration
+PLACEHOLDER_TEACHERS = ['-', 'Free']
+
+
+def normalize_teacher_name(name):
+    return re.sub(r'[^a-z0-9]', '', (name or '').lower())
+
+
+def link_existing_teachers(apps, schema_editor):
+    Teacher = apps.get_model('class_timetable', 'Teacher')
+    teachers = {}
+    for name in ['TycoAInput', 'TycoBInput', 'SycoAInput', 'SycoBInput', 'ClassTimetableEntry']:
+        model = apps.get_model('class_timetable', name)
+        for teacher_name in list(model.objects.values_list('teacher_name', flat=True).distinct()):
+            key = normalize_teacher_name(teacher_name)
+            if teacher_name in PLACEHOLDER_TEACHERS or not key:
+                continue
+            if key not in teachers:
+                teachers[key], _ = Teacher.objects.get_or_create(key=key, defaults={'name': teacher_name.strip()})
+            model.objects.filter(teacher_name=teacher_name).update(teacher=teachers[key])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable', '0005_classtimetableentry_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Teacher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='classtimetableentry',
+            name='ct_entry_teacher_slot_idx',
+        ),
+        migrations.AddField(
+            model_name='classtimetableentry',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='class_timetable.teacher'),
+        ),
+        migrations.AddField(
+            model_name='sycoainput',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='class_timetable.teacher'),
+        ),
+        migrations.AddField(
+            model_name='sycobinput',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='class_timetable.teacher'),
+        ),
+        migrations.AddField(
+            model_name='tycoainput',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='class_timetable.teacher'),
+        ),
+        migrations.AddField(
+            model_name='tycobinput',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='class_timetable.teacher'),
+        ),
+        migrations.AddIndex(
+            model_name='classtimetableentry',
+            index=models.Index(fields=['teacher', 'day', 'start_time'], name='ct_entry_teacher_slot_idx'),
+        ),
+        migrations.RunPython(link_existing_teachers, migrations.RunPython.noop),
+    ]
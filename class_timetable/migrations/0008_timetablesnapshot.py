@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable', '0007_timetableversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_key', models.CharField(max_length=20, unique=True)),
+                ('grid', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
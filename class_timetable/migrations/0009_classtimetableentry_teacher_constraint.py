@@ -0,0 +1,60 @@
+# Generated by Django 5.2.11 on 2026-10-18 16:15
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.utils import timezone
+
+
+def delete_clashing_timetables(apps, schema_editor):
+    """
+    Timetables generated before teachers were booked by Teacher can hold
+    one teacher under two spellings in the same slot, which the new
+    constraint rejects. Those timetables are invalid, so they are deleted
+    (as by the "Delete timetable" button) to be regenerated; inputs stay.
+    """
+    ClassTimetableEntry = apps.get_model('class_timetable', 'ClassTimetableEntry')
+    TimetableSnapshot = apps.get_model('class_timetable', 'TimetableSnapshot')
+    TimetableVersion = apps.get_model('class_timetable', 'TimetableVersion')
+
+    clashes = ClassTimetableEntry.objects.filter(teacher__isnull=False).values(
+        'teacher', 'day', 'start_time'
+    ).annotate(n=Count('id')).filter(n__gt=1)
+    class_keys = set()
+    for clash in clashes:
+        class_keys.update(ClassTimetableEntry.objects.filter(
+            teacher=clash['teacher'], day=clash['day'], start_time=clash['start_time']
+        ).values_list('class_key', flat=True))
+    if not class_keys:
+        return
+
+    ClassTimetableEntry.objects.filter(class_key__in=class_keys).delete()
+    TimetableSnapshot.objects.filter(class_key__in=class_keys).delete()
+    TimetableVersion.objects.bulk_create(
+        [TimetableVersion(class_key=key) for key in class_keys], ignore_conflicts=True
+    )
+    TimetableVersion.objects.filter(class_key__in=class_keys).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable', '0008_timetablesnapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='classtimetableentry',
+            name='ct_entry_unique_teacher_slot',
+        ),
+        migrations.RemoveIndex(
+            model_name='classtimetableentry',
+            name='ct_entry_teacher_slot_idx',
+        ),
+        migrations.RunPython(delete_clashing_timetables, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='classtimetableentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('teacher__isnull', False)), fields=('teacher', 'day', 'start_time'), name='ct_entry_unique_teacher_slot'),
+        ),
+    ]
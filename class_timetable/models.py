@@ -1,4 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from scheduling.versions import TimetableVersionBase
+from .teachers import PLACEHOLDER_TEACHERS, normalize_teacher_name
 
 # Common choices for validation (optional usage, but good for consistency)
 DAYS = [
@@ -10,10 +13,50 @@ DAYS = [
     ('Saturday', 'Saturday'),
 ]
 
+class Teacher(models.Model):
+    name = models.CharField(max_length=100)
+    # normalize_teacher_name(name): all spellings of a name share one Teacher
+    key = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_name(cls, name):
+        """
+        Returns the Teacher of a free-text name, creating it if needed.
+        Placeholder names ('-', 'Free') have no Teacher and return None.
+        """
+        key = normalize_teacher_name(name)
+        if name in PLACEHOLDER_TEACHERS or not key:
+            return None
+        teacher, _ = cls.objects.get_or_create(key=key, defaults={'name': name.strip()})
+        return teacher
+
+class TimetableVersion(TimetableVersionBase):
+    """
+    Version of a class timetable, bumped whenever its timetable or inputs
+    change; cached reports are keyed by it.
+    """
+
+class TimetableSnapshot(models.Model):
+    """
+    Display grid of a class timetable (see utils.build_display_grid),
+    written whenever the timetable is saved so views render it directly.
+    """
+    class_key = models.CharField(max_length=20, unique=True)
+    grid = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.class_key} snapshot"
+
 # base abstract class to avoid repetition in code, but resulting tables will be separate in DB
 class ClassInputBase(models.Model):
     subject_name = models.CharField(max_length=100)
     teacher_name = models.CharField(max_length=100)
+    # Set from teacher_name on save
+    teacher = models.ForeignKey(Teacher, on_delete=models.PROTECT, null=True, blank=True)
     
     # Updated fields as per user request
     theory_credits = models.IntegerField(default=0, help_text="Theory Load (e.g. 5 means 5 hours/week)")
@@ -27,12 +70,31 @@ class ClassInputBase(models.Model):
     def __str__(self):
         return f"{self.subject_name} ({self.teacher_name})"
 
+    def clean(self):
+        # A name without letters or digits has no Teacher key, so clashes
+        # of such inputs could not be detected
+        if self.teacher_name not in PLACEHOLDER_TEACHERS and not normalize_teacher_name(self.teacher_name):
+            raise ValidationError({'teacher_name': "Teacher name must contain letters or digits."})
+
+    # Input edits change the reports of the class (subclasses set class_key)
+    def save(self, *args, **kwargs):
+        self.teacher = Teacher.for_name(self.teacher_name)
+        super().save(*args, **kwargs)
+        TimetableVersion.bump(self.class_key)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        TimetableVersion.bump(self.class_key)
+        return result
+
 class ClassTimetableBase(models.Model):
     day = models.CharField(max_length=20, choices=DAYS)
     start_time = models.TimeField()
     end_time = models.TimeField()
     subject_name = models.CharField(max_length=100)
     teacher_name = models.CharField(max_length=100)
+    # None for placeholder rows (Library / empty batches)
+    teacher = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, blank=True)
     room = models.CharField(max_length=50, blank=True, null=True)
     # Batch identifier: 'ALL' for theory, 'A1', 'A2', 'A3' for practicals
     batch = models.CharField(max_length=10, default='ALL') 
@@ -45,28 +107,43 @@ class ClassTimetableBase(models.Model):
 
 # --- TYCO A ---
 class TycoAInput(ClassInputBase):
-    pass
-
-class TycoATimetable(ClassTimetableBase):
-    pass
+    class_key = 'tyco_a'
 
 # --- TYCO B ---
 class TycoBInput(ClassInputBase):
-    pass
-
-class TycoBTimetable(ClassTimetableBase):
-    pass
+    class_key = 'tyco_b'
 
 # --- SYCO A ---
 class SycoAInput(ClassInputBase):
-    pass
-
-class SycoATimetable(ClassTimetableBase):
-    pass
+    class_key = 'syco_a'
 
 # --- SYCO B ---
 class SycoBInput(ClassInputBase):
-    pass
+    class_key = 'syco_b'
 
-class SycoBTimetable(ClassTimetableBase):
-    pass
+# --- Timetables of all classes ---
+class ClassTimetableEntry(ClassTimetableBase):
+    # Key of the class in utils.CLASS_CONFIG, e.g. 'tyco_a'
+    class_key = models.CharField(max_length=20)
+
+    class Meta:
+        indexes = [
+            # Workload validation: lectures of a subject / batch
+            models.Index(fields=['class_key', 'subject_name', 'batch'], name='ct_entry_subject_idx'),
+        ]
+        constraints = [
+            # A teacher is in one place at a time, across all classes. Keyed
+            # on the Teacher so spelling variants of a name clash too; also
+            # serves as the index for cross-class teacher clash checks
+            models.UniqueConstraint(
+                fields=['teacher', 'day', 'start_time'],
+                condition=models.Q(teacher__isnull=False),
+                name='ct_entry_unique_teacher_slot',
+            ),
+            # One row per (class, day, slot, batch) cell; also serves as the
+            # index for loading / pivoting one class timetable
+            models.UniqueConstraint(
+                fields=['class_key', 'day', 'start_time', 'batch'],
+                name='ct_entry_unique_cell',
+            ),
+        ]
@@ -0,0 +1,187 @@
+"""
+OR-Tools CP-SAT engine for class timetables.
+
+Builds the same grid as utils.build_greedy_grid ((day, slot_idx) -> entry),
+so extra lectures and persistence are shared with the greedy engine.
+"""
+from ortools.sat.python import cp_model
+
+from .models import DAYS
+from .utils import ACADEMIC_SLOTS, DummyLab
+
+# Practical blocks are 2 consecutive slots: (0,1), (2,3), (4,5)
+BLOCK_STARTS = [0, 2, 4]
+
+# Objective weights: a batch's practical block covers two slots, a theory
+# lecture one. Every opened block costs a little so the solver prefers full
+# blocks over blocks where some batches sit in the Library.
+PRACTICAL_WEIGHT = 4
+THEORY_WEIGHT = 2
+BLOCK_PENALTY = 1
+
+
+def solve_class_cpsat(all_inputs, occupancy, batches, time_limit=10, workers=8):
+    """
+    Schedules one class against the teachers already booked in occupancy.
+    Returns the grid, or None if no solution was found within time_limit.
+    """
+    grids = solve_classes_cpsat({None: all_inputs}, {None: batches}, occupancy, time_limit, workers)
+    return None if grids is None else grids[None]
+
+
+def solve_classes_cpsat(inputs_by_class, batches_by_class, occupancy, time_limit=10, workers=8):
+    """
+    Schedules theory lectures and practical blocks for several classes in
+    one model, sharing teachers between them. batches_by_class lists the
+    practical batches of every class.
+
+    Hard constraints:
+    - a slot holds either one theory lecture or is part of one practical block
+    - at most one practical block per class per day
+    - at most 2 theory lectures of a subject per day
+    - a teacher teaches at most one batch/class per slot, across all classes
+    - teachers already busy in occupancy are never used
+
+    Theory hours and practical blocks are maximised up to each input's
+    credits, so a class that cannot be fully scheduled still gets the best
+    partial timetable instead of an infeasible model (leaving everything
+    unscheduled always satisfies the hard constraints).
+
+    Returns {class_key: grid}, or None if no solution was found within
+    time_limit.
+    """
+    days_list = [d[0] for d in DAYS]
+    slots = range(len(ACADEMIC_SLOTS))
+
+    model = cp_model.CpModel()
+
+    # theory[(class_key, inp_id, day, slot)]
+    theory = {}
+    # practical[(class_key, inp_id, batch, day, start)]
+    practical = {}
+    # block[(class_key, day, start)] = 1 if the block is a practical block
+    block = {}
+    # teacher_slot[(teacher_id, day, slot)] -> every variable that books the teacher there;
+    # inputs without a Teacher are not grouped, they share no teacher
+    teacher_slot = {}
+
+    for class_key, all_inputs in inputs_by_class.items():
+        batches = batches_by_class[class_key]
+        # Per input variable lists, for the credit limits
+        inp_theory = {inp.id: [] for inp in all_inputs}
+        inp_practical = {(inp.id, batch): [] for inp in all_inputs for batch in batches}
+
+        for day in days_list:
+            for start in BLOCK_STARTS:
+                block[(class_key, day, start)] = model.NewBoolVar(f"blk_{class_key}_{day}_{start}")
+
+            # Per (slot) and per (block, batch) variable lists of this class
+            slot_theory = {s: [] for s in slots}
+            block_batch = {(start, batch): [] for start in BLOCK_STARTS for batch in batches}
+
+            for inp in all_inputs:
+                teacher = inp.teacher_id
+                if inp.theory_credits > 0:
+                    day_vars = []
+                    for s in slots:
+                        if occupancy.is_busy([teacher], day, [s]):
+                            continue
+                        v = model.NewBoolVar(f"th_{class_key}_{inp.id}_{day}_{s}")
+                        theory[(class_key, inp.id, day, s)] = v
+                        slot_theory[s].append(v)
+                        day_vars.append(v)
+                        inp_theory[inp.id].append(v)
+                        if teacher is not None:
+                            teacher_slot.setdefault((teacher, day, s), []).append(v)
+                    # Max 2 lectures of a subject per day
+                    if len(day_vars) > 2:
+                        model.Add(sum(day_vars) <= 2)
+
+                if inp.practical_credits // 2 > 0:
+                    for start in BLOCK_STARTS:
+                        if occupancy.is_busy([teacher], day, [start, start + 1]):
+                            continue
+                        for batch in batches:
+                            v = model.NewBoolVar(f"pr_{class_key}_{inp.id}_{batch}_{day}_{start}")
+                            practical[(class_key, inp.id, batch, day, start)] = v
+                            block_batch[(start, batch)].append(v)
+                            inp_practical[(inp.id, batch)].append(v)
+                            if teacher is not None:
+                                teacher_slot.setdefault((teacher, day, start), []).append(v)
+                                teacher_slot.setdefault((teacher, day, start + 1), []).append(v)
+
+            # One practical block per day
+            model.Add(sum(block[(class_key, day, start)] for start in BLOCK_STARTS) <= 1)
+
+            for start in BLOCK_STARTS:
+                blk = block[(class_key, day, start)]
+                in_block = []
+                # Each batch does at most one lab, and only in an opened block
+                for batch in batches:
+                    vs = block_batch[(start, batch)]
+                    in_block.extend(vs)
+                    model.Add(sum(vs) <= blk)
+                # No empty blocks
+                model.Add(sum(in_block) >= blk)
+
+            # A slot holds one theory lecture or belongs to the practical block
+            for s in slots:
+                start = s - (s % 2)
+                model.Add(sum(slot_theory[s]) + block[(class_key, day, start)] <= 1)
+
+        for inp in all_inputs:
+            if inp_theory[inp.id]:
+                model.Add(sum(inp_theory[inp.id]) <= inp.theory_credits)
+            for batch in batches:
+                if inp_practical[(inp.id, batch)]:
+                    model.Add(sum(inp_practical[(inp.id, batch)]) <= inp.practical_credits // 2)
+
+    # A teacher is in one place at a time, within and across classes
+    for vs in teacher_slot.values():
+        if len(vs) > 1:
+            model.Add(sum(vs) <= 1)
+
+    model.Maximize(
+        PRACTICAL_WEIGHT * sum(practical.values())
+        + THEORY_WEIGHT * sum(theory.values())
+        - BLOCK_PENALTY * sum(block.values())
+    )
+
+    # --- Solve ---
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    solver.parameters.num_workers = int(workers)
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+
+    # --- Build grids ---
+    inputs_by_id = {
+        (class_key, inp.id): inp
+        for class_key, all_inputs in inputs_by_class.items()
+        for inp in all_inputs
+    }
+    grids = {class_key: {} for class_key in inputs_by_class}
+
+    for (class_key, inp_id, day, s), v in theory.items():
+        if solver.Value(v):
+            inp = inputs_by_id[(class_key, inp_id)]
+            grids[class_key][(day, s)] = {'type': 'TH', 'subject': inp, 'batch': 'ALL'}
+            occupancy.occupy([inp.teacher_id], day, [s])
+
+    chosen = {}
+    for (class_key, inp_id, batch, day, start), v in practical.items():
+        if solver.Value(v):
+            chosen[(class_key, batch, day, start)] = inputs_by_id[(class_key, inp_id)]
+
+    for (class_key, day, start), v in block.items():
+        if not solver.Value(v):
+            continue
+        batches = batches_by_class[class_key]
+        labs = [chosen.get((class_key, batch, day, start)) or DummyLab() for batch in batches]
+        entry = {'type': 'PR', 'labs': labs, 'batches': list(batches)}
+        grids[class_key][(day, start)] = entry
+        grids[class_key][(day, start + 1)] = entry
+        occupancy.occupy([x.teacher_id for x in labs], day, [start, start + 1])
+
+    return grids
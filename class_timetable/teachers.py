@@ -0,0 +1,55 @@
+"""
+Normalization of the free-text teacher names into Teacher rows.
+"""
+import re
+
+# Teacher names used for placeholder rows (Library / empty batches);
+# they may appear in many cells at once and never map to a Teacher
+PLACEHOLDER_TEACHERS = ['-', 'Free']
+
+def normalize_teacher_name(name):
+    """
+    Key shared by all spellings of a teacher name:
+    'Mr. P. D. Kate' and 'Mr.P.D.kate' both become 'mrpdkate'.
+    """
+    return re.sub(r'[^a-z0-9]', '', (name or '').lower())
+
+def link_teachers(models):
+    """
+    Points the teacher FK of every row of `models` at the Teacher matching
+    its teacher_name, creating Teachers as needed (one UPDATE per distinct
+    spelling). Placeholder names are unlinked. The queryset updates skip
+    save(), so the classes whose rows changed get their TimetableVersion
+    bumped here.
+    Returns {teacher: set of spellings found}.
+    """
+    from .models import Teacher, TimetableVersion
+
+    teachers = {t.key: t for t in Teacher.objects.all()}
+    spellings = {}
+    changed_classes = set()
+    for model in models:
+        names = model.objects.values_list('teacher_name', flat=True).distinct()
+        for name in list(names):
+            key = normalize_teacher_name(name)
+            if name in PLACEHOLDER_TEACHERS or not key:
+                teacher = None
+            else:
+                teacher = teachers.get(key)
+                if teacher is None:
+                    teacher = Teacher.objects.create(key=key, name=name.strip())
+                    teachers[key] = teacher
+                spellings.setdefault(teacher, set()).add(name)
+
+            changed = model.objects.filter(teacher_name=name).exclude(teacher=teacher)
+            # Inputs name their class on the model, timetable rows per row
+            if isinstance(getattr(model, 'class_key', None), str):
+                if changed.exists():
+                    changed_classes.add(model.class_key)
+            else:
+                changed_classes.update(changed.values_list('class_key', flat=True).distinct())
+            changed.update(teacher=teacher)
+
+    if changed_classes:
+        TimetableVersion.bump(*changed_classes)
+    return spellings
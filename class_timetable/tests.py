@@ -1,3 +1,174 @@
-from django.test import TestCase
+import random
+from itertools import product
+from types import SimpleNamespace
 
-# Create your tests here.
+from datetime import time
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+
+from timetable.models import AcademicClass
+
+from .exports import export_class
+from .models import DAYS, ClassTimetableEntry, Teacher
+from .solver import solve_classes_cpsat
+from .utils import ACADEMIC_SLOTS, TeacherOccupancy, count_practical_blocks, match_lab_block
+
+
+def make_input(id, teacher_id, theory=0, practical=0):
+    return SimpleNamespace(
+        id=id, teacher_id=teacher_id, subject_name=f"S{id}", teacher_name=f"T{teacher_id}",
+        theory_credits=theory, practical_credits=practical,
+    )
+
+
+def teachers_by_cell(grids):
+    """
+    {(day, slot): [teacher ids booked there, over all classes]}
+    """
+    cells = {}
+    for grid in grids.values():
+        for cell, data in grid.items():
+            if data['type'] == 'TH':
+                teachers = [data['subject'].teacher_id]
+            else:
+                teachers = [lab.teacher_id for lab in data['labs']]
+            cells.setdefault(cell, []).extend(t for t in teachers if t is not None)
+    return cells
+
+
+class SolverTests(SimpleTestCase):
+    def solve(self, inputs_by_class, occupancy=None):
+        batches = {key: ['A1', 'A2'] for key in inputs_by_class}
+        grids = solve_classes_cpsat(inputs_by_class, batches, occupancy or TeacherOccupancy(), time_limit=10, workers=1)
+        self.assertIsNotNone(grids)
+        return grids
+
+    def test_shared_teacher_never_clashes(self):
+        # Teacher 1 teaches in both classes, more hours than a day has slots
+        grids = self.solve({
+            'a': [make_input(1, 1, theory=5, practical=2), make_input(2, 2, theory=4)],
+            'b': [make_input(3, 1, theory=5, practical=2), make_input(4, 3, theory=4)],
+        })
+        for cell, teachers in teachers_by_cell(grids).items():
+            self.assertEqual(len(teachers), len(set(teachers)), cell)
+        theory = sum(
+            1 for grid in grids.values() for data in grid.values()
+            if data['type'] == 'TH' and data['subject'].teacher_id == 1
+        )
+        self.assertEqual(theory, 10)
+
+    def test_one_practical_block_per_day(self):
+        # Three batches want more blocks than there are days
+        grids = self.solve({'a': [make_input(i, i, practical=2 * len(DAYS)) for i in range(1, 4)]})
+        starts = {(day, slot - slot % 2) for (day, slot), data in grids['a'].items() if data['type'] == 'PR'}
+        days = [day for day, _ in starts]
+        self.assertEqual(len(days), len(DAYS))
+        self.assertEqual(len(set(days)), len(days))
+
+    def test_busy_teacher_is_not_used(self):
+        occupancy = TeacherOccupancy()
+        busy_day = DAYS[0][0]
+        occupancy.occupy([1], busy_day, range(len(ACADEMIC_SLOTS)))
+        grids = self.solve({'a': [make_input(1, 1, theory=5, practical=2)]}, occupancy)
+        self.assertNotIn(1, sum((t for (day, _), t in teachers_by_cell(grids).items() if day == busy_day), []))
+
+    def test_inputs_without_teacher_share_slots(self):
+        # Untaught subjects fill every slot of both classes at the same time
+        per_day = len(ACADEMIC_SLOTS) // 2
+        grids = self.solve({
+            key: [make_input(f"{key}{i}", None, theory=2 * len(DAYS)) for i in range(per_day)]
+            for key in ['a', 'b']
+        })
+        for grid in grids.values():
+            self.assertEqual(sum(1 for data in grid.values() if data['type'] == 'TH'), len(DAYS) * len(ACADEMIC_SLOTS))
+
+
+def max_matching(pools, is_free):
+    # Brute force: try every choice of one input (or none) per pool
+    best = 0
+    for choice in product(*[[None] + [inp for inp in pool if is_free(inp)] for pool in pools]):
+        teachers = [inp.teacher_id for inp in choice if inp is not None]
+        if len(teachers) == len(set(teachers)):
+            best = max(best, len(teachers))
+    return best
+
+
+class MatchLabBlockTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            inputs = [make_input(i, rng.randrange(4)) for i in range(6)]
+            pools = [rng.choices(inputs, k=rng.randrange(4)) for _ in range(rng.randrange(1, 5))]
+            free = {inp.id for inp in inputs if rng.random() < 0.8}
+            is_free = lambda inp: inp.id in free
+
+            picked = match_lab_block(pools, is_free)
+
+            self.assertEqual(len(picked), len(pools))
+            chosen = [(b, inp) for b, inp in enumerate(picked) if inp is not None]
+            for b, inp in chosen:
+                self.assertIn(inp, pools[b])
+                self.assertIn(inp.id, free)
+            teachers = [inp.teacher_id for _, inp in chosen]
+            self.assertEqual(len(teachers), len(set(teachers)))
+            self.assertEqual(len(chosen), max_matching(pools, is_free))
+
+    def test_reassigns_to_serve_every_batch(self):
+        # Batch 0 can take teacher 1 or 2, batch 1 only teacher 1
+        both = [make_input(1, 1), make_input(2, 2)]
+        only = [make_input(3, 1)]
+        for _ in range(20):
+            picked = match_lab_block([both, only])
+            self.assertEqual([inp.teacher_id for inp in picked], [2, 1])
+
+
+class CountPracticalBlocksTests(SimpleTestCase):
+    def test_counts_consecutive_pairs(self):
+        # Slots 0-1 (10-12) and 4-5 (15-17) are blocks on the same day
+        self.assertEqual(count_practical_blocks([(0, 0), (0, 1)]), 1)
+        self.assertEqual(count_practical_blocks([(0, 0), (0, 1), (2, 4), (2, 5)]), 2)
+
+    def test_lunch_and_day_boundaries_split_blocks(self):
+        # 11-12 and 12:45-13:45 are separated by lunch
+        self.assertEqual(count_practical_blocks([(0, 1), (0, 2)]), 0)
+        self.assertEqual(count_practical_blocks([(0, 5), (1, 0)]), 0)
+
+    def test_odd_leftover_is_half_a_block(self):
+        self.assertEqual(count_practical_blocks([(0, 0)]), 0.5)
+        self.assertEqual(count_practical_blocks([(0, 0), (0, 1), (3, 2)]), 1.5)
+        self.assertEqual(count_practical_blocks([]), 0)
+
+
+class TeacherSlotConstraintTests(TestCase):
+    def entry(self, class_key, teacher_name, teacher=None):
+        return ClassTimetableEntry.objects.create(
+            class_key=class_key, day='Monday', start_time=time(10, 0), end_time=time(11, 0),
+            subject_name='OSY', teacher_name=teacher_name, teacher=teacher,
+        )
+
+    def test_spellings_of_one_teacher_clash(self):
+        teacher = Teacher.for_name('Mr. P. D. Kate')
+        self.entry('tyco_a', 'Mr. P. D. Kate', teacher)
+        with self.assertRaises(IntegrityError):
+            self.entry('syco_b', 'Mr.P.D.kate', teacher)
+
+    def test_rows_without_teacher_share_slots(self):
+        self.entry('tyco_a', '-')
+        self.entry('syco_b', '-')
+        self.assertEqual(ClassTimetableEntry.objects.count(), 2)
+
+
+class ExportClassTests(TestCase):
+    def test_known_classes(self):
+        self.assertIsNone(export_class('class_timetable', ''))
+        self.assertEqual(export_class('class_timetable', 'tyco_a'), 'tyco_a')
+        self.assertEqual(export_class('class_timetable_v2', 'syco_b'), 'syco_b')
+        academic_class = AcademicClass.objects.create(name='SYCO C', semester='SEM-III', academic_year='2025-26')
+        self.assertEqual(export_class('timetable', str(academic_class.pk)), academic_class.pk)
+
+    def test_unknown_classes(self):
+        for source, value in [('class_timetable', 'typo'), ('class_timetable_v2', 'typo'),
+                              ('timetable', 'abc'), ('timetable', '999')]:
+            with self.assertRaises(ValueError):
+                export_class(source, value)
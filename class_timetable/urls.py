@@ -7,6 +7,7 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('overall_analytics/', views.overall_analytics_view, name='overall_analytics'),
     path('overall_validation/', views.overall_validation_view, name='overall_validation'),
+    path('generate_all/', views.generate_all_view, name='generate_all'),
     path('input/<str:class_key>/', views.input_data, name='input_data'),
     path('input/<str:class_key>/delete/<int:input_id>/', views.delete_input, name='delete_input'),
     path('generate/<str:class_key>/', views.generate_timetable_view, name='generate'),
@@ -14,4 +15,11 @@ urlpatterns = [
     path('analytics/<str:class_key>/', views.analytics_view, name='analytics'),
     path('validation/<str:class_key>/', views.validate_workload_view, name='validation'),
     path('delete/<str:class_key>/', views.delete_timetable, name='delete_timetable'),
+    path('export/<str:source>/<str:fmt>/', views.export_view, name='export'),
+    path('teachers/', views.teacher_list_view, name='teachers'),
+    path('teachers/<int:teacher_id>/', views.teacher_timetable_view, name='teacher_timetable'),
+    path('teachers/<int:teacher_id>/json/', views.teacher_timetable_json, name='teacher_timetable_json'),
+    path('calendar/class/<str:class_key>/', views.class_calendar_view, name='class_calendar'),
+    path('calendar/class/<str:class_key>/<str:batch>/', views.class_calendar_view, name='batch_calendar'),
+    path('calendar/teacher/<int:teacher_id>/', views.teacher_calendar_view, name='teacher_calendar'),
 ]
@@ -1,13 +1,21 @@
+import os
 import random
-import itertools
-from datetime import time, datetime, timedelta
+from time import time as timestamp
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import time, datetime
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from .models import (
-    TycoAInput, TycoATimetable,
-    TycoBInput, TycoBTimetable,
-    SycoAInput, SycoATimetable,
-    SycoBInput, SycoBTimetable,
-    DAYS
+    TycoAInput, TycoBInput, SycoAInput, SycoBInput,
+    ClassTimetableEntry, TimetableVersion, TimetableSnapshot, DAYS
 )
+from .teachers import PLACEHOLDER_TEACHERS
+from scheduling.occupancy import TeacherOccupancy as SharedTeacherOccupancy
+from timetable.models import Room
+from scheduling.rooms import LAB, CLASSROOM, Session, RoomSpec, cell_bit, allocate_rooms, no_room_warning
 
 # === CONFIGURATION ===
 ACADEMIC_SLOTS = [
@@ -19,11 +27,13 @@ ACADEMIC_SLOTS = [
     (time(16, 0), time(17, 0)),
 ]
 
+# 'batches' lists the practical batches of the class (any number);
+# 'strength' is the number of students, checked against room capacity
 CLASS_CONFIG = {
-    'tyco_a': {'input': TycoAInput, 'timetable': TycoATimetable, 'name': 'TYCO A'},
-    'tyco_b': {'input': TycoBInput, 'timetable': TycoBTimetable, 'name': 'TYCO B'},
-    'syco_a': {'input': SycoAInput, 'timetable': SycoATimetable, 'name': 'SYCO A'},
-    'syco_b': {'input': SycoBInput, 'timetable': SycoBTimetable, 'name': 'SYCO B'},
+    'tyco_a': {'input': TycoAInput, 'name': 'TYCO A', 'batches': ['A1', 'A2', 'A3'], 'strength': 60},
+    'tyco_b': {'input': TycoBInput, 'name': 'TYCO B', 'batches': ['A1', 'A2', 'A3'], 'strength': 60},
+    'syco_a': {'input': SycoAInput, 'name': 'SYCO A', 'batches': ['A1', 'A2', 'A3'], 'strength': 60},
+    'syco_b': {'input': SycoBInput, 'name': 'SYCO B', 'batches': ['A1', 'A2', 'A3'], 'strength': 60},
 }
 
 # --- HELPER FOR ABBREVIATIONS ---
@@ -59,44 +69,378 @@ SUBJECT_ABBR = {
     "User Interface Design": "UID"
 }
 
+# Rows of the displayed timetable: the academic slots plus the breaks
+DISPLAY_ROWS = [
+    {'start': time(10,0), 'end': time(11,0), 'label': '10:00 am to 11:00 am', 'type': 'slot'},
+    {'start': time(11,0), 'end': time(12,0), 'label': '11:00 am to 12:00 pm', 'type': 'slot'},
+    {'label': 'LUNCH BREAK', 'type': 'break', 'start': time(12,0), 'end': time(12,45)},
+    {'start': time(12,45), 'end': time(13,45), 'label': '12:45 pm to 01:45 pm', 'type': 'slot'},
+    {'start': time(13,45), 'end': time(14,45), 'label': '01:45 pm to 02:45 pm', 'type': 'slot'},
+    {'label': 'TEA BREAK', 'type': 'break', 'start': time(14,45), 'end': time(15,0)},
+    {'start': time(15,0), 'end': time(16,0), 'label': '03:00 pm to 04:00 pm', 'type': 'slot'},
+    {'start': time(16,0), 'end': time(17,0), 'label': '04:00 pm to 05:00 pm', 'type': 'slot'},
+]
+
 def get_abbr(name):
     return SUBJECT_ABBR.get(name, name[:3].upper())
 
-def check_teacher_conflict_bulk(teacher_list, day, start_time, exclude_class_key):
+def class_entries(class_key):
     """
-    Returns True if ANY teacher in the list is busy in another class.
+    Timetable rows of one class (all classes share ClassTimetableEntry).
     """
-    for key, cfg in CLASS_CONFIG.items():
-        if key == exclude_class_key:
-            continue
-        
-        # Check timetable of other class
-        busy = cfg['timetable'].objects.filter(
-            teacher_name__in=teacher_list, 
-            day=day, 
-            start_time=start_time
-        ).exists()
-        
-        if busy:
-            return True
-    return False
+    return ClassTimetableEntry.objects.filter(class_key=class_key)
+
+# Stand-in for a batch that has no lab in a practical block
+class DummyLab:
+    subject_name = "Library"
+    teacher_name = "-"
+    teacher_id = None
+    id = -1
+
+# Available generation engines (see generate_timetable_for_class)
+ENGINES = ['greedy', 'multistart', 'cpsat']
+
+# Penalties used to rank generated grids (lower is better)
+SCORE_WEIGHTS = {
+    'theory_deficit': 10,     # per missing theory lecture
+    'practical_deficit': 10,  # per missing practical block of a batch
+    'library': 3,             # per Library period (filler or empty lab batch)
+    'extra': 1,               # per extra lecture
+}
+
+class TeacherOccupancy(SharedTeacherOccupancy):
+    """
+    Teacher bookings keyed by Teacher id; slots are ACADEMIC_SLOTS indexes.
+    Inputs without a Teacher are never booked.
+    """
+    def __init__(self):
+        super().__init__([d[0] for d in DAYS], range(len(ACADEMIC_SLOTS)), ignore=(None,))
 
-def check_single_conflict(teacher, day, start_time, exclude_class_key):
-    return check_teacher_conflict_bulk([teacher], day, start_time, exclude_class_key)
+    @classmethod
+    def from_other_classes(cls, exclude_class_key):
+        """
+        Loads the timetables of every other class (one query).
+        """
+        occupancy = cls()
+        slot_index = {s[0]: i for i, s in enumerate(ACADEMIC_SLOTS)}
+        rows = ClassTimetableEntry.objects.exclude(
+            class_key=exclude_class_key
+        ).filter(
+            teacher__isnull=False
+        ).values_list('teacher_id', 'day', 'start_time')
+        for teacher, day, start_time in rows:
+            if start_time in slot_index:
+                occupancy.occupy([teacher], day, [slot_index[start_time]])
+        return occupancy
 
-def generate_timetable_for_class(class_key):
+    def occupy_grid(self, grid):
+        """
+        Marks every teacher placed in a generated grid as busy.
+        """
+        for (day, slot_idx), data in grid.items():
+            if data['type'] == 'PR':
+                self.occupy([x.teacher_id for x in data['labs']], day, [slot_idx])
+            elif data['type'] in ['TH', 'EXTRA']:
+                self.occupy([data['subject'].teacher_id], day, [slot_idx])
+
+def generate_timetable_for_class(class_key, engine=None, time_limit=None, workers=None):
+    """
+    Generates and saves the timetable of one class.
+
+    engine is 'greedy' (randomized heuristic), 'multistart' (best of several
+    greedy runs) or 'cpsat' (OR-Tools solver); it defaults to
+    settings.CLASS_TIMETABLE_ENGINE. time_limit (seconds) applies to
+    multistart and the solver, workers only to the solver; both default to
+    the matching settings.
+
+    Returns (success, message); the message of a success is "Generated",
+    or the no_room_warning if some sessions got no room.
+    """
     if class_key not in CLASS_CONFIG:
         return False, "Invalid Class"
 
-    InputModel = CLASS_CONFIG[class_key]['input']
-    TimetableModel = CLASS_CONFIG[class_key]['timetable']
+    engine = engine or getattr(settings, 'CLASS_TIMETABLE_ENGINE', 'greedy')
+    if engine not in ENGINES:
+        return False, f"Unknown engine '{engine}'"
 
-    # 1. Clear Timetable
-    TimetableModel.objects.all().delete()
+    InputModel = CLASS_CONFIG[class_key]['input']
+    batches = CLASS_CONFIG[class_key]['batches']
 
-    # 2. Fetch Inputs
+    # 1. Fetch Inputs (the old timetable is replaced on save, see STEP E)
     all_inputs = list(InputModel.objects.all())
-    
+    occupancy = TeacherOccupancy.from_other_classes(class_key)
+
+    if engine == 'cpsat':
+        from .solver import solve_class_cpsat
+        grid = solve_class_cpsat(
+            all_inputs, occupancy, batches,
+            time_limit=time_limit or getattr(settings, 'CLASS_TIMETABLE_SOLVER_TIME_LIMIT', 10),
+            workers=workers or getattr(settings, 'CLASS_TIMETABLE_SOLVER_WORKERS', 8),
+        )
+        if grid is None:
+            return False, "No timetable found within the solver time limit"
+    elif engine == 'multistart':
+        grid = best_greedy_grid(
+            all_inputs, occupancy, batches,
+            attempts=getattr(settings, 'CLASS_TIMETABLE_ATTEMPTS', 32),
+            deadline=timestamp() + (time_limit or getattr(settings, 'CLASS_TIMETABLE_SOLVER_TIME_LIMIT', 10)),
+        )
+    else:
+        grid = build_greedy_grid(all_inputs, occupancy, batches)
+
+    fill_extra_lectures(grid, all_inputs, occupancy)
+
+    # --- STEP E: ROOMS, SAVE TO DB ---
+    rows = build_timetable_rows(class_key, grid)
+    unroomed = assign_rooms(rows, others=ClassTimetableEntry.objects.exclude(class_key=class_key))
+    save_timetable(class_key, rows)
+
+    return True, no_room_warning(unroomed) or "Generated"
+
+def generate_all_timetables(engine=None, time_limit=None, workers=None):
+    """
+    Generates the timetables of every class in CLASS_CONFIG together.
+
+    All classes are rebuilt, so none of the stored timetables is treated as
+    fixed: the solver schedules every class in one model over the shared
+    teachers, and the greedy engine places them one after another (in random
+    order) against a single in-memory occupancy. All timetables are written
+    in one transaction. Returns (success, message) like
+    generate_timetable_for_class.
+    """
+    engine = engine or getattr(settings, 'CLASS_TIMETABLE_ENGINE', 'greedy')
+    if engine not in ENGINES:
+        return False, f"Unknown engine '{engine}'"
+
+    inputs_by_class = {
+        key: list(cfg['input'].objects.all()) for key, cfg in CLASS_CONFIG.items()
+    }
+    batches_by_class = {key: cfg['batches'] for key, cfg in CLASS_CONFIG.items()}
+    occupancy = TeacherOccupancy()
+
+    if engine == 'cpsat':
+        from .solver import solve_classes_cpsat
+        grids = solve_classes_cpsat(
+            inputs_by_class, batches_by_class, occupancy,
+            time_limit=time_limit or getattr(settings, 'CLASS_TIMETABLE_SOLVER_TIME_LIMIT', 10),
+            workers=workers or getattr(settings, 'CLASS_TIMETABLE_SOLVER_WORKERS', 8),
+        )
+        if grids is None:
+            return False, "No timetable found within the solver time limit"
+    elif engine == 'multistart':
+        order = list(inputs_by_class)
+        random.shuffle(order)
+        # One time limit for the whole run, shared out among the classes
+        # still to place
+        deadline = timestamp() + (time_limit or getattr(settings, 'CLASS_TIMETABLE_SOLVER_TIME_LIMIT', 10))
+        grids = {}
+        for i, key in enumerate(order):
+            now = timestamp()
+            grids[key] = best_greedy_grid(
+                inputs_by_class[key], occupancy, batches_by_class[key],
+                attempts=getattr(settings, 'CLASS_TIMETABLE_ATTEMPTS', 32),
+                deadline=now + max(0, deadline - now) / (len(order) - i),
+            )
+    else:
+        order = list(inputs_by_class)
+        random.shuffle(order)
+        grids = {
+            key: build_greedy_grid(inputs_by_class[key], occupancy, batches_by_class[key])
+            for key in order
+        }
+
+    for key, grid in grids.items():
+        fill_extra_lectures(grid, inputs_by_class[key], occupancy)
+
+    # Every old timetable is deleted before any new row is inserted, so a
+    # new row never clashes with a stale row of another class
+    rows = []
+    for key, grid in grids.items():
+        rows.extend(build_timetable_rows(key, grid))
+    unroomed = assign_rooms(rows)
+    with transaction.atomic():
+        ClassTimetableEntry.objects.filter(class_key__in=list(grids)).delete()
+        ClassTimetableEntry.objects.bulk_create(rows)
+        for key in grids:
+            save_display_grid(key, [row for row in rows if row.class_key == key])
+        TimetableVersion.bump(*grids)
+
+    return True, no_room_warning(unroomed) or "Generated"
+
+def score_grid(grid, all_inputs, batches):
+    """
+    Penalty of a complete grid (see SCORE_WEIGHTS); lower is better.
+    """
+    theory_count = {}
+    practical_count = {}
+    library = 0
+    extra = 0
+    for (day, slot_idx), data in grid.items():
+        if data['type'] == 'TH':
+            theory_count[data['subject'].id] = theory_count.get(data['subject'].id, 0) + 1
+        elif data['type'] == 'EXTRA':
+            extra += 1
+        elif data['type'] == 'FILLER':
+            library += 1
+        elif data['type'] == 'PR':
+            for batch, lab in zip(data['batches'], data['labs']):
+                if lab.id == -1:
+                    library += 1
+                elif slot_idx % 2 == 0:
+                    # Count each 2-hour block once, on its first slot
+                    key = (lab.id, batch)
+                    practical_count[key] = practical_count.get(key, 0) + 1
+
+    theory_deficit = 0
+    practical_deficit = 0
+    for inp in all_inputs:
+        theory_deficit += max(0, inp.theory_credits - theory_count.get(inp.id, 0))
+        for batch in batches:
+            expected = inp.practical_credits // 2
+            practical_deficit += max(0, expected - practical_count.get((inp.id, batch), 0))
+
+    return (
+        SCORE_WEIGHTS['theory_deficit'] * theory_deficit
+        + SCORE_WEIGHTS['practical_deficit'] * practical_deficit
+        + SCORE_WEIGHTS['library'] * library
+        + SCORE_WEIGHTS['extra'] * extra
+    )
+
+_greedy_pool = None
+
+def greedy_pool():
+    """
+    Process pool of the multistart engine, started on first use and reused
+    by every generation (and replaced if a worker dies). It has one worker
+    per CPU unless CLASS_TIMETABLE_MULTISTART_PROCESSES caps its size.
+    """
+    global _greedy_pool
+    if _greedy_pool is None:
+        _greedy_pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'CLASS_TIMETABLE_MULTISTART_PROCESSES', None) or os.cpu_count(),
+            initializer=django.setup,
+        )
+    return _greedy_pool
+
+def _greedy_attempt(seed, all_inputs, occupancy, batches, deadline=None):
+    """
+    One independently seeded greedy run (executed in a worker process).
+    Returns None without running if the deadline has already passed, so
+    attempts queued in a worker do not outlive the generation.
+    """
+    if deadline is not None and timestamp() >= deadline:
+        return None
+    random.seed(seed)
+    occupancy = occupancy.copy()
+    grid = build_greedy_grid(all_inputs, occupancy, batches)
+    fill_extra_lectures(grid, all_inputs, occupancy)
+    return score_grid(grid, all_inputs, batches), grid
+
+def best_greedy_grid(all_inputs, occupancy, batches, attempts=32, deadline=None):
+    """
+    Runs `attempts` seeded greedy generations in the shared process pool
+    and returns the best scoring grid finished by `deadline` (a time.time()
+    value). Attempts not started by then are cancelled; if none has
+    finished, the grid of a fixed seed is built here instead of waiting.
+    occupancy is updated with the chosen grid.
+    """
+    if deadline is None:
+        deadline = timestamp() + getattr(settings, 'CLASS_TIMETABLE_SOLVER_TIME_LIMIT', 10)
+    seeds = [random.randrange(2 ** 32) for _ in range(attempts)]
+
+    global _greedy_pool
+    pool = greedy_pool()
+    futures = []
+    broken = False
+    try:
+        for seed in seeds:
+            futures.append(pool.submit(_greedy_attempt, seed, all_inputs, occupancy, batches, deadline))
+    except BrokenProcessPool:
+        broken = True
+    done, pending = wait(futures, timeout=max(0, deadline - timestamp()))
+    for future in pending:
+        future.cancel()
+
+    results = []
+    for future in done:
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            broken = True
+        elif error is None and future.result() is not None:
+            results.append(future.result())
+    if broken:
+        # A worker died and the pool is unusable: start a new one next time
+        if _greedy_pool is pool:
+            _greedy_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not results:
+        state = random.getstate()
+        results = [_greedy_attempt(0, all_inputs, occupancy, batches)]
+        random.setstate(state)
+
+    score, grid = min(results, key=lambda r: r[0])
+    occupancy.occupy_grid(grid)
+    return grid
+
+def match_lab_block(pools, is_free=None):
+    """
+    Picks at most one input from each pool (one pool per batch) so that all
+    picked teachers are distinct and, if given, is_free(inp) holds for each,
+    serving as many batches as possible. Returns a list aligned with pools
+    holding the picked input or None.
+
+    This is a bipartite matching between batches and teachers, solved with
+    augmenting paths in O(batches x edges), so the cost stays predictable
+    as the number of batches grows.
+
+    Duplicate references in a pool are collapsed into (input, multiplicity)
+    and every pool is visited in a multiplicity-weighted random order, so
+    inputs with more remaining blocks are preferred and runs stay random.
+    """
+    options = []
+    for pool in pools:
+        counts = {}
+        unique = {}
+        for inp in pool:
+            counts[inp.id] = counts.get(inp.id, 0) + 1
+            unique[inp.id] = inp
+        if is_free is not None:
+            unique = {i: inp for i, inp in unique.items() if is_free(inp)}
+        # Weighted shuffle (Efraimidis-Spirakis): key = u ** (1 / weight)
+        order = sorted(unique, key=lambda i: random.random() ** (1.0 / counts[i]), reverse=True)
+        # One edge per teacher, through the teacher's preferred input
+        by_teacher = {}
+        for i in order:
+            by_teacher.setdefault(unique[i].teacher_id, unique[i])
+        options.append(list(by_teacher.items()))
+
+    owner = {}  # teacher -> index of the batch using them
+    picked = [None] * len(pools)
+
+    def augment(b, visited):
+        for teacher, inp in options[b]:
+            if teacher in visited:
+                continue
+            visited.add(teacher)
+            if teacher not in owner or augment(owner[teacher], visited):
+                owner[teacher] = b
+                picked[b] = inp
+                return True
+        return False
+
+    batch_order = list(range(len(pools)))
+    random.shuffle(batch_order)
+    for b in batch_order:
+        augment(b, set())
+    return picked
+
+def build_greedy_grid(all_inputs, occupancy, batches):
+    """
+    Randomized heuristic placement of theory (Steps B, C) and practical
+    blocks for the given batches (Steps A, A.5).
+    Returns the grid: (day, slot_idx) -> entry.
+    """
     theory_pool = []
     
     for inp in all_inputs:
@@ -126,10 +470,9 @@ def generate_timetable_for_class(class_key):
             
             for i in candidates_indices:
                 candidate = theory_pool[i]
-                start_time = ACADEMIC_SLOTS[slot_idx][0]
                 
                 # 1. Conflict Check
-                if check_single_conflict(candidate.teacher_name, day, start_time, class_key):
+                if occupancy.is_busy([candidate.teacher_id], day, [slot_idx]):
                     continue
                     
                 # 2. Daily Limit Check (Max 2 per day)
@@ -147,6 +490,7 @@ def generate_timetable_for_class(class_key):
             
             if placed_t:
                 grid[(day, slot_idx)] = {'type': 'TH', 'subject': placed_t, 'batch': 'ALL'}
+                occupancy.occupy([placed_t.teacher_id], day, [slot_idx])
                 
     # --- STEP C: BACKFILL UNSCHEDULED WORKLOAD (MOVED TO TOP) ---
     # 1. Try to place remaining theory items into empty slots
@@ -163,12 +507,12 @@ def generate_timetable_for_class(class_key):
             if not theory_pool:
                 break
             
-            start_time = ACADEMIC_SLOTS[s][0]
             placed_idx = -1
             
             for i, cand in enumerate(theory_pool):
-                if not check_single_conflict(cand.teacher_name, d, start_time, class_key):
+                if not occupancy.is_busy([cand.teacher_id], d, [s]):
                     grid[(d, s)] = {'type': 'TH', 'subject': cand, 'batch': 'ALL'}
+                    occupancy.occupy([cand.teacher_id], d, [s])
                     placed_idx = i
                     break
             
@@ -176,23 +520,19 @@ def generate_timetable_for_class(class_key):
                 theory_pool.pop(placed_idx)
     
     # --- STEP A: SCHEDULE PRACTICALS ---
-    lab_pools = {'A1': [], 'A2': [], 'A3': []}
+    # One pool per batch, with one input reference per block still needed
+    lab_pools = {batch: [] for batch in batches}
     
     for inp in all_inputs:
         blocks = inp.practical_credits // 2
         for _ in range(blocks):
-            for batch in ['A1', 'A2', 'A3']:
+            for batch in batches:
                 lab_pools[batch].append(inp) # Add input object reference
-                
-    for b in lab_pools:
-        random.shuffle(lab_pools[b])
 
     for day in days_list:
         possible_starts = [0, 2, 4]
         random.shuffle(possible_starts)
         
-        placed_pr = False
-        
         for start_slot in possible_starts:
             s1 = start_slot
             s2 = start_slot + 1
@@ -200,181 +540,84 @@ def generate_timetable_for_class(class_key):
                 continue
 
             # Check pools
-            if not lab_pools['A1'] or not lab_pools['A2'] or not lab_pools['A3']:
-                break
-                
-            # Create all valid combinations from available pools using itertools
-            p1 = lab_pools['A1']
-            p2 = lab_pools['A2']
-            p3 = lab_pools['A3']
-            
-            # Generate all combinations
-            gen = itertools.product(p1, p2, p3)
-            
-            # To randomize, convert to list and shuffle (safe for small N)
-            try:
-                candidates = list(gen)
-                random.shuffle(candidates)
-            except:
-                candidates = []
-            
-            found_trio = None
-            
-            for tri_tuple in candidates:
-                c1, c2, c3 = tri_tuple
-                
-                # 1. Unique Teachers Check
-                teachers = {c1.teacher_name, c2.teacher_name, c3.teacher_name}
-                if len(teachers) < 3:
-                    continue
-                    
-                # 2. Conflict Check (External Timetables)
-                if check_teacher_conflict_bulk(list(teachers), day, ACADEMIC_SLOTS[s1][0], class_key): continue
-                if check_teacher_conflict_bulk(list(teachers), day, ACADEMIC_SLOTS[s2][0], class_key): continue
-                
-                # Found valid!
-                found_trio = [c1, c2, c3]
+            if not all(lab_pools[b] for b in batches):
                 break
+
+            # Every batch needs a lab, with unique teachers free in both hours
+            def is_free(inp):
+                return not occupancy.is_busy([inp.teacher_id], day, [s1, s2])
+
+            labs = match_lab_block([lab_pools[b] for b in batches], is_free)
             
-            if found_trio:
+            if all(labs):
                 # Place
-                grid[(day, s1)] = {'type': 'PR', 'trio': found_trio, 'batches': ['A1', 'A2', 'A3']}
-                grid[(day, s2)] = {'type': 'PR', 'trio': found_trio, 'batches': ['A1', 'A2', 'A3']}
+                grid[(day, s1)] = {'type': 'PR', 'labs': labs, 'batches': list(batches)}
+                grid[(day, s2)] = {'type': 'PR', 'labs': labs, 'batches': list(batches)}
+                occupancy.occupy([c.teacher_id for c in labs], day, [s1, s2])
                 
                 # Remove from pools
-                lab_pools['A1'].remove(found_trio[0])
-                lab_pools['A2'].remove(found_trio[1])
-                lab_pools['A3'].remove(found_trio[2])
+                for batch, lab in zip(batches, labs):
+                    lab_pools[batch].remove(lab)
                 
-                placed_pr = True
                 break
     
     # --- STEP A.5: BACKFILL PRACTICAL WORKLOAD (DEFICIT) ---
-    # This ensures any low-load batches get filled in empty slots even if not full trios.
-    
-    # 1. Calculate deficit
-    practical_deficit = {} 
-    
-    # We must scan current grid to see what was placed in Step A
-    for inp in all_inputs:
-        if inp.practical_credits > 0:
-            expected_blocks = inp.practical_credits // 2
-            for batch in ['A1', 'A2', 'A3']:
-                actual_count = 0
-                for (day, slot_idx), data in grid.items():
-                    if data.get('type') == 'PR':
-                        trio = data.get('trio', [])
-                        batches = data.get('batches', [])
-                        for idx, b in enumerate(batches):
-                            if b == batch and idx < len(trio) and trio[idx].id == inp.id:
-                                actual_count += 1
-                                break
-                actual_blocks = actual_count // 2
-                if actual_blocks < expected_blocks:
-                    deficit = expected_blocks - actual_blocks
-                    practical_deficit[(inp.id, batch)] = {'subject': inp, 'deficit': deficit}
+    # Blocks that could not be placed for every batch at once are placed
+    # for as many batches as possible; the others get a Library period.
+    practical_deficit = {}
+    for batch in batches:
+        for inp in lab_pools[batch]:
+            key = (inp.id, batch)
+            if key not in practical_deficit:
+                practical_deficit[key] = {'subject': inp, 'deficit': 0}
+            practical_deficit[key]['deficit'] += 1
                     
     if practical_deficit:
-        # Find empty 2-hour blocks OR Library blocks
+        # Find empty 2-hour blocks
         empty_blocks = []
         for day in days_list:
             for start_slot in [0, 2, 4]:
                 s1, s2 = start_slot, start_slot + 1
-                # Check empty
                 if (day, s1) not in grid and (day, s2) not in grid:
                     empty_blocks.append((day, start_slot))
-                # Check library/filler if needed? Step D hasn't run yet so no FILLERs.
-                # But Step B/C might have left gaps.
         
         random.shuffle(empty_blocks)
         
-        class DummyLab:
-             subject_name = "Library"
-             teacher_name = "-"
-             id = -1
-
         for day, start_slot in empty_blocks:
             if not practical_deficit: break
             s1, s2 = start_slot, start_slot + 1
             
-            # Group candidates
-            batch_candidates = {'A1': [], 'A2': [], 'A3': []}
-            for key, data in practical_deficit.items():
-                batch_candidates[data['subject'].id, key[1]] = data['subject'] # Avoid duplicates? No, keys distinct
-                batch_candidates[key[1]].append(data['subject'])
-
-            def is_valid_combo(combo_items):
-                real_items = [x for x in combo_items if x is not None]
-                if not real_items: return False
-                teachers = set()
-                for item in real_items:
-                    if item.teacher_name in teachers: return False
-                    teachers.add(item.teacher_name)
-                t_list = list(teachers)
-                if check_teacher_conflict_bulk(t_list, day, ACADEMIC_SLOTS[s1][0], class_key): return False
-                if check_teacher_conflict_bulk(t_list, day, ACADEMIC_SLOTS[s2][0], class_key): return False
-                return True
+            # Group candidates (with remaining deficit as multiplicity)
+            batch_candidates = {batch: [] for batch in batches}
+            for (inp_id, batch), data in practical_deficit.items():
+                batch_candidates[batch].extend([data['subject']] * data['deficit'])
 
-            final_combo = None
-            
-            # 1. Full Trio
-            if batch_candidates['A1'] and batch_candidates['A2'] and batch_candidates['A3']:
-                # Limited attempts for performance
-                prod_iter = itertools.product(batch_candidates['A1'], batch_candidates['A2'], batch_candidates['A3'])
-                try: 
-                    cands = list(prod_iter)
-                    random.shuffle(cands)
-                    for c in cands:
-                        if is_valid_combo(c):
-                            final_combo = c
-                            break
-                except: pass
-
-            # 2. Pair
-            if not final_combo:
-                 l1 = batch_candidates['A1'] + [None]
-                 l2 = batch_candidates['A2'] + [None]
-                 l3 = batch_candidates['A3'] + [None]
-                 
-                 # Random probing
-                 for _ in range(50):
-                     c1 = random.choice(l1)
-                     c2 = random.choice(l2)
-                     c3 = random.choice(l3)
-                     if c1 is None and c2 is None and c3 is None: continue
-                     real = [x for x in [c1,c2,c3] if x]
-                     if len(real) < 2: continue
-                     
-                     if is_valid_combo((c1, c2, c3)):
-                         final_combo = (c1, c2, c3)
-                         break
-
-            # 3. Single
-            if not final_combo:
-                 # Explicit iterate over all single candidates
-                 singles = []
-                 for x in batch_candidates['A1']: singles.append((x, None, None))
-                 for x in batch_candidates['A2']: singles.append((None, x, None))
-                 for x in batch_candidates['A3']: singles.append((None, None, x))
-                 random.shuffle(singles)
-                 for c in singles:
-                     if is_valid_combo(c):
-                         final_combo = c
-                         break
-
-            if final_combo:
-                safe_trio = [x if x else DummyLab() for x in final_combo]
-                grid[(day, s1)] = {'type': 'PR', 'trio': safe_trio, 'batches': ['A1', 'A2', 'A3']}
-                grid[(day, s2)] = {'type': 'PR', 'trio': safe_trio, 'batches': ['A1', 'A2', 'A3']}
+            def is_free(inp):
+                return not occupancy.is_busy([inp.teacher_id], day, [s1, s2])
+
+            labs = match_lab_block([batch_candidates[b] for b in batches], is_free)
+
+            if any(labs):
+                labs = [x if x else DummyLab() for x in labs]
+                grid[(day, s1)] = {'type': 'PR', 'labs': labs, 'batches': list(batches)}
+                grid[(day, s2)] = {'type': 'PR', 'labs': labs, 'batches': list(batches)}
+                occupancy.occupy([x.teacher_id for x in labs], day, [s1, s2])
                 
-                for idx, batch in enumerate(['A1', 'A2', 'A3']):
-                    subj = safe_trio[idx]
+                for batch, subj in zip(batches, labs):
                     if subj.id != -1:
                         key = (subj.id, batch)
-                        if key in practical_deficit:
-                            practical_deficit[key]['deficit'] -= 1
-                            if practical_deficit[key]['deficit'] <= 0:
-                                del practical_deficit[key]
+                        practical_deficit[key]['deficit'] -= 1
+                        if practical_deficit[key]['deficit'] <= 0:
+                            del practical_deficit[key]
+
+    return grid
+
+def fill_extra_lectures(grid, all_inputs, occupancy):
+    """
+    STEP D: fills every slot left empty in the grid with an extra lecture,
+    or a Library period if no teacher is free.
+    """
+    days_list = [d[0] for d in DAYS]
 
     # --- STEP D: FILL REMAINING GAPS WITH EXTRA LECTURES ---
     # User Request: "extra lecture should be 1 dont add library lecture"
@@ -403,8 +646,6 @@ def generate_timetable_for_class(class_key):
             # So double check
             if (day, slot_idx) in grid: continue
 
-            start_time = ACADEMIC_SLOTS[slot_idx][0]
-            
             # Find best candidate: Lowest extra count first
             # Sort candidates by extra_counts[id] ASC
             candidates = sorted(unique_subjects, key=lambda s: extra_counts[s.id])
@@ -414,19 +655,24 @@ def generate_timetable_for_class(class_key):
                 # Limit: Try to keep extras <= 1 per subject if possible
                 
                 # Check Conflict
-                if not check_single_conflict(cand.teacher_name, day, start_time, class_key):
+                if not occupancy.is_busy([cand.teacher_id], day, [slot_idx]):
                     placed_extra = cand
                     break
             
             if placed_extra:
                 grid[(day, slot_idx)] = {'type': 'EXTRA', 'subject': placed_extra, 'batch': 'ALL'}
+                occupancy.occupy([placed_extra.teacher_id], day, [slot_idx])
                 extra_counts[placed_extra.id] += 1
             else:
                 # If absolutely no teacher is free (rare), we must leave it or mark Library
                 grid[(day, slot_idx)] = {'type': 'FILLER', 'subject_name': 'Library', 'batch': 'ALL'}
-    for item in grid.items():
-        key, data = item
-        day, slot_idx = key
+
+def build_timetable_rows(class_key, grid):
+    """
+    Converts a generated grid into unsaved ClassTimetableEntry rows.
+    """
+    rows = []
+    for (day, slot_idx), data in grid.items():
         start, end = ACADEMIC_SLOTS[slot_idx]
         
         if data['type'] in ['TH', 'EXTRA']:
@@ -440,47 +686,283 @@ def generate_timetable_for_class(class_key):
             else:
                 s_name = base_name
 
-            t_name = subj.teacher_name
-            
-            TimetableModel.objects.create(
-                day=day, start_time=start, end_time=end,
-                subject_name=s_name, teacher_name=t_name, batch='ALL'
-            )
+            rows.append(ClassTimetableEntry(
+                class_key=class_key, day=day, start_time=start, end_time=end,
+                subject_name=s_name, teacher_name=subj.teacher_name,
+                teacher_id=subj.teacher_id, batch='ALL'
+            ))
 
         elif data['type'] == 'PR':
-            trio_labs = data['trio']
-            for idx, batch_code in enumerate(['A1', 'A2', 'A3']):
-                if idx < len(trio_labs):
-                    lab_obj = trio_labs[idx]
+            labs = data['labs']
+            for idx, batch_code in enumerate(data['batches']):
+                if idx < len(labs):
+                    lab_obj = labs[idx]
                     s_name = get_abbr(lab_obj.subject_name)
                     t_name = lab_obj.teacher_name
+                    t_id = lab_obj.teacher_id
                 else:
                     s_name = "Free"
                     t_name = "-"
+                    t_id = None
                 
-                TimetableModel.objects.create(
-                    day=day, start_time=start, end_time=end,
-                    subject_name=s_name, teacher_name=t_name, batch=batch_code
-                )
+                rows.append(ClassTimetableEntry(
+                    class_key=class_key, day=day, start_time=start, end_time=end,
+                    subject_name=s_name, teacher_name=t_name, teacher_id=t_id,
+                    batch=batch_code
+                ))
         
         elif data['type'] == 'FILLER':
-            TimetableModel.objects.create(
-                day=day, start_time=start, end_time=end,
+            rows.append(ClassTimetableEntry(
+                class_key=class_key, day=day, start_time=start, end_time=end,
                 subject_name="Library", teacher_name="-", batch='ALL'
-            )
+            ))
+    return rows
+
+def assign_rooms(rows, others=None):
+    """
+    Fills the room of the timetable rows with timetable.Room numbers:
+    classrooms for whole-class lectures, labs for practical batches (both
+    slots of a block share the lab), none for Library / free rows.
+    Rooms used at the same time by `others` (rows of other classes) are
+    avoided. Rows without a suitable free room keep room=None.
+    Returns the number of sessions left without a room.
+    """
+    slot_index = {start: i for i, (start, _) in enumerate(ACADEMIC_SLOTS)}
+    day_index = {day: i for i, (day, _) in enumerate(DAYS)}
+
+    def cell(day, start):
+        return cell_bit(day_index[day], slot_index[start], len(ACADEMIC_SLOTS))
+
+    occupancy = {}
+    if others is not None:
+        for room, day, start in others.filter(room__isnull=False).values_list('room', 'day', 'start_time'):
+            occupancy[room] = occupancy.get(room, 0) | cell(day, start)
+
+    # Group the rows into sessions: [rows], group size, room type
+    sessions = []
+    open_blocks = {}
+    for row in sorted(rows, key=lambda r: (r.class_key, r.day, r.batch, r.start_time)):
+        if row.teacher_name in PLACEHOLDER_TEACHERS:
+            continue
+        cfg = CLASS_CONFIG[row.class_key]
+        if row.batch == 'ALL':
+            sessions.append(([row], cfg['strength'], CLASSROOM))
+            continue
+
+        idx = slot_index[row.start_time]
+        block = open_blocks.pop((row.class_key, row.day, row.batch), None)
+        if block and (block[1], idx) in BLOCK_SLOT_PAIRS and block[0][0].subject_name == row.subject_name:
+            block[0].append(row)
+        else:
+            session = ([row], -(-cfg['strength'] // len(cfg['batches'])), LAB)
+            sessions.append(session)
+            open_blocks[(row.class_key, row.day, row.batch)] = (session[0], idx)
+
+    allocation = allocate_rooms(
+        [RoomSpec(*room) for room in Room.objects.values_list('room_number', 'capacity', 'room_type')],
+        [
+            Session(i, sum(cell(r.day, r.start_time) for r in session_rows), size, room_type)
+            for i, (session_rows, size, room_type) in enumerate(sessions)
+        ],
+        occupancy,
+    )
+    for i, (session_rows, _, _) in enumerate(sessions):
+        for row in session_rows:
+            row.room = allocation[i]
+    return sum(1 for room in allocation.values() if room is None)
+
+def save_timetable(class_key, rows):
+    """
+    Replaces the stored timetable of the class with `rows`.
+    The delete and a single bulk insert share one transaction, so readers
+    never see a half-written timetable and SQLite commits only once.
+    """
+    with transaction.atomic():
+        class_entries(class_key).delete()
+        ClassTimetableEntry.objects.bulk_create(rows)
+        save_display_grid(class_key, rows)
+        TimetableVersion.bump(class_key)
 
-    return True, "Generated"
+def build_display_grid(entries):
+    """
+    Pivots timetable rows into the JSON grid rendered by view.html:
+    one row per DISPLAY_ROWS item, one cell per day, with the two slots of
+    a practical block merged into one cell (rowspan 2).
+    """
+    days = [d[0] for d in DAYS]
+
+    # Map (day, start_time) -> entries
+    data_map = {}
+    for entry in entries:
+        data_map.setdefault((entry.day, entry.start_time), []).append(entry)
+
+    rows = []
+    # Track covered cells: (row_index, day)
+    covered_cells = set()
+
+    for r_idx, r in enumerate(DISPLAY_ROWS):
+        row_data = {
+            'label': r['label'],
+            'type': r['type'],
+            'start': r['start'].isoformat(),
+            'end': r['end'].isoformat(),
+            'days': []
+        }
+        
+        if r['type'] == 'slot':
+            for day in days:
+                if (r_idx, day) in covered_cells:
+                    row_data['days'].append({'skipped': True})
+                    continue
+                
+                cell_entries = sorted(data_map.get((day, r['start']), []), key=lambda x: x.batch)
+                is_practical = (len(cell_entries) > 1)
+                rowspan = 1
+                
+                # Merge a practical block of 2 hours; rows 0, 3, 6 start the blocks
+                if is_practical and r_idx in [0, 3, 6] and (r_idx + 1) < len(DISPLAY_ROWS):
+                    next_row = DISPLAY_ROWS[r_idx + 1]
+                    if next_row['type'] == 'slot' and len(data_map.get((day, next_row['start']), [])) > 1:
+                        rowspan = 2
+                        covered_cells.add((r_idx + 1, day))
+
+                row_data['days'].append({
+                    'entries': [
+                        {'batch': e.batch, 'subject_name': e.subject_name, 'teacher_name': e.teacher_name}
+                        for e in cell_entries
+                    ],
+                    'is_practical': is_practical,
+                    'rowspan': rowspan,
+                    'skipped': False
+                })
+        
+        rows.append(row_data)
 
-def validate_workload_distribution(class_key):
+    return {'days': days, 'rows': rows}
+
+def save_display_grid(class_key, entries):
+    grid = build_display_grid(entries)
+    TimetableSnapshot.objects.update_or_create(class_key=class_key, defaults={'grid': grid})
+    return grid
+
+def load_display_grid(class_key):
+    """
+    Display grid of the class, with row times as time objects. Timetables
+    saved before snapshots existed get their snapshot built here, once.
+    """
+    grid = TimetableSnapshot.objects.filter(class_key=class_key).values_list('grid', flat=True).first()
+    if grid is None:
+        grid = save_display_grid(class_key, list(class_entries(class_key)))
+    for row in grid['rows']:
+        row['start'] = time.fromisoformat(row['start'])
+        row['end'] = time.fromisoformat(row['end'])
+    return grid
+
+# --- TEACHER TIMETABLES ---
+def teacher_week(teacher):
+    """
+    Weekly timetable of a teacher across all classes, read with one query
+    on the (teacher, day, start_time) index.
+    Returns the DISPLAY_ROWS grid (each cell a list of lectures) plus the
+    teaching hours and idle gaps (free slots between the first and last
+    lecture) of every day.
+    """
+    lectures = ClassTimetableEntry.objects.filter(teacher=teacher).order_by(
+        'day', 'start_time', 'class_key', 'batch'
+    ).values_list('class_key', 'day', 'start_time', 'subject_name', 'batch')
+
+    slots = {}
+    for class_key, day, start_time, subject_name, batch in lectures:
+        slots.setdefault((day, start_time), []).append({
+            'class_key': class_key,
+            'class_name': CLASS_CONFIG[class_key]['name'],
+            'subject_name': subject_name,
+            'batch': batch,
+        })
+
+    days = [d[0] for d in DAYS]
+    rows = []
+    for row in DISPLAY_ROWS:
+        rows.append({
+            'label': row['label'],
+            'type': row['type'],
+            'start': row['start'],
+            'end': row['end'],
+            'days': [slots.get((day, row['start']), []) if row['type'] == 'slot' else [] for day in days],
+        })
+
+    daily = []
+    for day in days:
+        busy = [i for i, (start, _) in enumerate(ACADEMIC_SLOTS) if (day, start) in slots]
+        gaps = busy[-1] - busy[0] + 1 - len(busy) if busy else 0
+        daily.append({'day': day, 'hours': len(busy), 'gaps': gaps})
+
+    return {
+        'days': days,
+        'rows': rows,
+        'daily': daily,
+        'hours': sum(d['hours'] for d in daily),
+        'gaps': sum(d['gaps'] for d in daily),
+        'max_daily': max(d['hours'] for d in daily),
+    }
+
+# Columns of the timetable rows used by the reports
+REPORT_FIELDS = [
+    'class_key', 'teacher_id', 'teacher_name', 'day', 'start_time', 'end_time',
+    'subject_name', 'batch'
+]
+
+# Slot pairs (i, j) that form a practical block when slot j follows slot i
+# on the same day: j starts at most 15 minutes (a break) after i ends
+BLOCK_SLOT_PAIRS = {
+    (i, j)
+    for i, (_, end) in enumerate(ACADEMIC_SLOTS)
+    for j, (start, _) in enumerate(ACADEMIC_SLOTS)
+    if 0 <= (datetime.combine(datetime.today(), start) - datetime.combine(datetime.today(), end)).total_seconds() <= 900
+}
+
+def count_practical_blocks(cells):
+    """
+    Counts the practical blocks in a sorted list of (day_idx, slot_idx)
+    cells of one subject and batch: each pair of consecutive cells is one
+    block, and an odd leftover cell counts as half a block.
+    """
+    blocks = 0
+    prev = None
+    for cell in cells:
+        if prev and prev[0] == cell[0] and (prev[1], cell[1]) in BLOCK_SLOT_PAIRS:
+            blocks += 1
+            prev = None
+            continue
+        prev = cell
+    if len(cells) % 2 == 1:
+        blocks += 0.5
+    return blocks
+
+def load_report_rows(queryset=None):
+    """
+    Timetable rows as named tuples (see REPORT_FIELDS), in insertion order,
+    for analyze_timetable and validate_workload_distribution.
+    Defaults to the rows of every class.
+    """
+    if queryset is None:
+        queryset = ClassTimetableEntry.objects.all()
+    return list(queryset.order_by('pk').values_list(*REPORT_FIELDS, named=True))
+
+def validate_workload_distribution(class_key, rows=None, inputs=None):
     """
     Comprehensive validation of practical and theory workload distribution.
     Returns detailed report on what's missing and what needs to be redistributed.
+
+    The timetable is loaded once and grouped by (subject_name, batch) as
+    sorted (day, slot) cells, so the report costs two queries whatever the
+    number of subjects and batches. rows (from load_report_rows, any
+    classes) and inputs may be passed in to share one load between reports.
     """
     if class_key not in CLASS_CONFIG:
         return {'error': 'Invalid Class'}
     
     cfg = CLASS_CONFIG[class_key]
-    TimetableModel = cfg['timetable']
     InputModel = cfg['input']
     
     validation = {
@@ -492,8 +974,26 @@ def validate_workload_distribution(class_key):
         'total_practical_deficit': 0,
         'recommendations': []
     }
-    
-    inputs = InputModel.objects.all()
+
+    day_index = {d[0]: i for i, d in enumerate(DAYS)}
+    slot_index = {s[0]: i for i, s in enumerate(ACADEMIC_SLOTS)}
+
+    if rows is None:
+        rows = load_report_rows(class_entries(class_key))
+    if inputs is None:
+        inputs = InputModel.objects.all()
+
+    # (subject_name, batch) -> [(day_idx, slot_idx)]
+    cells = {}
+    for row in rows:
+        if row.class_key != class_key:
+            continue
+        cells.setdefault((row.subject_name, row.batch), []).append(
+            (day_index.get(row.day, -1), slot_index.get(row.start_time, -1))
+        )
+    for group in cells.values():
+        group.sort()
+    theory_counts = {name: len(group) for (name, batch), group in cells.items() if batch == 'ALL'}
     
     for inp in inputs:
         # === THEORY VALIDATION ===
@@ -501,16 +1001,10 @@ def validate_workload_distribution(class_key):
         abbr = get_abbr(inp.subject_name)
         
         # Count actual theory sessions (excluding extras)
-        actual_theory = TimetableModel.objects.filter(
-            subject_name=abbr,
-            batch='ALL'
-        ).exclude(subject_name__contains=' - E').count()
+        actual_theory = theory_counts.get(abbr, 0)
         
         # Count extra sessions
-        extra_theory = TimetableModel.objects.filter(
-            subject_name__contains=f"{abbr} - E",
-            batch='ALL'
-        ).count()
+        extra_theory = sum(n for name, n in theory_counts.items() if f"{abbr} - E" in name)
         
         theory_status = "OK"
         if actual_theory < exp_theory:
@@ -538,31 +1032,9 @@ def validate_workload_distribution(class_key):
         if inp.practical_credits > 0:
             exp_practical_blocks = inp.practical_credits // 2
             
-            for batch in ['A1', 'A2', 'A3']:
-                # Count practical sessions for this batch
+            for batch in cfg['batches']:
                 # Each practical block appears in 2 consecutive slots
-                practical_entries = TimetableModel.objects.filter(
-                    subject_name=abbr,
-                    batch=batch
-                ).order_by('day', 'start_time')
-                
-                # Count unique blocks (consecutive pairs)
-                actual_blocks = 0
-                prev_entry = None
-                for entry in practical_entries:
-                    if prev_entry:
-                        # Check if this is consecutive with previous
-                        time_diff = (datetime.combine(datetime.today(), entry.start_time) - 
-                                   datetime.combine(datetime.today(), prev_entry.end_time)).seconds
-                        if time_diff <= 900:  # Within 15 minutes (accounting for breaks)
-                            actual_blocks += 1
-                            prev_entry = None
-                            continue
-                    prev_entry = entry
-                
-                # If odd number of entries, count the last one as a partial block
-                if len(practical_entries) % 2 == 1:
-                    actual_blocks += 0.5
+                actual_blocks = count_practical_blocks(cells.get((abbr, batch), []))
                 
                 practical_status = "OK"
                 if actual_blocks < exp_practical_blocks:
@@ -598,15 +1070,22 @@ def validate_workload_distribution(class_key):
     
     return validation
 
-def analyze_timetable(class_key):
+def analyze_timetable(class_key, rows=None, inputs=None):
     """
     Analyzes the generated timetable for conflicts and workload distribution.
+
+    Runs a fixed number of queries: the class timetable, the rows of the
+    other classes that share its teachers, and the inputs are each loaded
+    once. Conflicts come from a hash join on (teacher, day, start_time),
+    workload from counts grouped by (subject_name, batch). rows (from
+    load_report_rows, covering every class) and inputs may be passed in to
+    share one load between reports.
     """
     if class_key not in CLASS_CONFIG:
         return {'error': 'Invalid Class'}
         
     cfg = CLASS_CONFIG[class_key]
-    TimetableModel = cfg['timetable']
+    batches = cfg['batches']
     InputModel = cfg['input']
     
     analysis = {
@@ -615,39 +1094,46 @@ def analyze_timetable(class_key):
         'is_balanced': True,
         'has_conflicts': False
     }
+
+    if rows is None:
+        my_entries = load_report_rows(class_entries(class_key))
+        teacher_ids = {row.teacher_id for row in my_entries if row.teacher_id is not None}
+        other_entries = load_report_rows(
+            ClassTimetableEntry.objects.filter(teacher_id__in=teacher_ids).exclude(class_key=class_key)
+        )
+    else:
+        my_entries = [row for row in rows if row.class_key == class_key]
+        other_entries = [row for row in rows if row.class_key != class_key]
+    if inputs is None:
+        inputs = InputModel.objects.all()
     
     # 1. Check Conflicts
-    my_entries = TimetableModel.objects.all()
-    
-    for entry in my_entries:
-        if entry.teacher_name in ['-', 'Free']:
+    # Build side: bookings of the teachers in all other classes
+    other_bookings = {}
+    for row in other_entries:
+        if row.teacher_id is not None:
+            other_bookings.setdefault((row.teacher_id, row.day, row.start_time), []).append(row)
+
+    # Probe side: every booked entry of this class
+    for row in my_entries:
+        if row.teacher_id is None:
             continue
-            
-        # Check against all other classes
-        for other_key, other_cfg in CLASS_CONFIG.items():
-            if other_key == class_key:
-                continue
-            
-            OtherTimetable = other_cfg['timetable']
-            
-            overlaps = OtherTimetable.objects.filter(
-                teacher_name=entry.teacher_name,
-                day=entry.day,
-                start_time=entry.start_time
-            )
-            
-            for overlap in overlaps:
-                analysis['conflicts'].append({
-                    'teacher': entry.teacher_name,
-                    'day': entry.day,
-                    'time': f"{entry.start_time} - {entry.end_time}",
-                    'other_class': other_cfg['name'],
-                    'other_subject': overlap.subject_name
-                })
-                analysis['has_conflicts'] = True
+        for overlap in other_bookings.get((row.teacher_id, row.day, row.start_time), []):
+            analysis['conflicts'].append({
+                'teacher': row.teacher_name,
+                'day': row.day,
+                'time': f"{row.start_time} - {row.end_time}",
+                'other_class': CLASS_CONFIG.get(overlap.class_key, {}).get('name', overlap.class_key),
+                'other_subject': overlap.subject_name
+            })
+            analysis['has_conflicts'] = True
 
     # 2. Check Workload Distribution
-    inputs = InputModel.objects.all()
+    # Entries per (subject_name, batch); theory rows have batch 'ALL'
+    counts = {}
+    for row in my_entries:
+        counts[(row.subject_name, row.batch)] = counts.get((row.subject_name, row.batch), 0) + 1
+    theory_counts = {name: n for (name, batch), n in counts.items() if batch == 'ALL'}
     
     for inp in inputs:
         exp_th = inp.theory_credits
@@ -655,16 +1141,8 @@ def analyze_timetable(class_key):
         
         abbr = get_abbr(inp.subject_name)
         
-        act_th = TimetableModel.objects.filter(
-            subject_name__startswith=abbr, 
-            batch='ALL'
-        ).count()
-        
-        # ACT PR: Sum of entries across all batches
-        act_pr = TimetableModel.objects.filter(
-            subject_name=abbr,
-            batch__in=['A1', 'A2', 'A3']
-        ).count()
+        # Theory and extra lectures ("ABBR - E")
+        act_th = sum(n for name, n in theory_counts.items() if name.startswith(abbr))
         
         status = "Balanced"
         if act_th < exp_th:
@@ -674,10 +1152,9 @@ def analyze_timetable(class_key):
             status = "Overloaded (Theory)"
         
         # Check Practical Batch-wise
-        batches = ['A1', 'A2', 'A3']
         pr_status = []
         for b in batches:
-            b_act = TimetableModel.objects.filter(subject_name=abbr, batch=b).count()
+            b_act = counts.get((abbr, b), 0)
             if b_act < exp_pr:
                 pr_status.append(f"{b}: Low ({b_act}/{exp_pr})")
                 analysis['is_balanced'] = False
@@ -695,3 +1172,50 @@ def analyze_timetable(class_key):
         })
 
     return analysis
+
+# --- CACHED REPORTS ---
+REPORTS = {
+    'analysis': analyze_timetable,
+    'validation': validate_workload_distribution,
+}
+
+def timetable_versions():
+    """
+    {class_key: version} of every class (0 if never changed).
+    """
+    versions = dict(TimetableVersion.objects.values_list('class_key', 'version'))
+    return {key: versions.get(key, 0) for key in CLASS_CONFIG}
+
+def report_cache_key(kind, class_key, versions):
+    # Conflicts in the analysis depend on every class, validation only on its own
+    if kind == 'analysis':
+        version = '.'.join(str(versions[key]) for key in CLASS_CONFIG)
+    else:
+        version = versions[class_key]
+    return f"class_timetable:{kind}:{class_key}:{version}"
+
+def cached_reports(kind, class_keys=None):
+    """
+    {class_key: report} for `kind` ('analysis' or 'validation'), served from
+    the cache while the timetable versions are unchanged. Reports missing
+    from the cache are computed from one shared load of the timetable rows.
+    """
+    class_keys = list(class_keys or CLASS_CONFIG)
+    versions = timetable_versions()
+    keys = {class_key: report_cache_key(kind, class_key, versions) for class_key in class_keys}
+    hits = cache.get_many(keys.values())
+
+    reports = {}
+    missing = [class_key for class_key in class_keys if keys[class_key] not in hits]
+    if missing:
+        rows = load_report_rows()
+        for class_key in missing:
+            reports[class_key] = REPORTS[kind](class_key, rows=rows)
+        cache.set_many(
+            {keys[class_key]: reports[class_key] for class_key in missing},
+            getattr(settings, 'CLASS_TIMETABLE_REPORT_CACHE_TIMEOUT', 3600)
+        )
+    return {
+        class_key: reports[class_key] if class_key in reports else hits[keys[class_key]]
+        for class_key in class_keys
+    }
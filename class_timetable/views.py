@@ -1,8 +1,20 @@
+import tempfile
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.http import content_disposition_header
+from django.conf import settings
 from django.contrib import messages
-from .utils import CLASS_CONFIG, generate_timetable_for_class, ACADEMIC_SLOTS, analyze_timetable, validate_workload_distribution
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Teacher, TimetableVersion, TimetableSnapshot
+from .utils import CLASS_CONFIG, class_entries, generate_timetable_for_class, generate_all_timetables, ACADEMIC_SLOTS, cached_reports, load_display_grid, timetable_versions, teacher_week
+from .ical import feed_cache_key, feed_lines, class_feed_entries, teacher_feed_entries, cached_stream
+from .exports import EXPORT_SOURCES, EXPORT_FORMATS, export_class, export_rows, write_xlsx
 from .forms import TycoAInputForm, TycoBInputForm, SycoAInputForm, SycoBInputForm
-from datetime import time
 
 def dashboard(request):
     classes = CLASS_CONFIG.keys()
@@ -58,20 +70,34 @@ def generate_timetable_view(request, class_key):
     if class_key not in CLASS_CONFIG:
         return redirect('class_timetable:dashboard')
         
-    success, msg = generate_timetable_for_class(class_key)
+    # ?engine=cpsat selects the solver, otherwise settings.CLASS_TIMETABLE_ENGINE
+    success, msg = generate_timetable_for_class(class_key, engine=request.GET.get('engine'))
     if success:
         messages.success(request, f"Timetable generated for {class_key}")
+        if msg != "Generated":
+            messages.warning(request, msg)
     else:
         messages.error(request, f"Error: {msg}")
         
     return redirect('class_timetable:view_timetable', class_key=class_key)
 
+def generate_all_view(request):
+    success, msg = generate_all_timetables(engine=request.GET.get('engine'))
+    if success:
+        messages.success(request, "Timetables generated for all classes")
+        if msg != "Generated":
+            messages.warning(request, msg)
+    else:
+        messages.error(request, f"Error: {msg}")
+
+    return redirect('class_timetable:dashboard')
+
 def validate_workload_view(request, class_key):
     if class_key not in CLASS_CONFIG:
         return redirect('class_timetable:dashboard')
     
     cfg = CLASS_CONFIG[class_key]
-    validation = validate_workload_distribution(class_key)
+    validation = cached_reports('validation', [class_key])[class_key]
     
     return render(request, 'class_timetable/validation.html', {
         'class_name': cfg['name'],
@@ -81,21 +107,16 @@ def validate_workload_view(request, class_key):
 
 def overall_analytics_view(request):
     results = {}
-    for class_key in CLASS_CONFIG:
-        # Check if timetable has entries? Or just run analysis
-        # analysis handles empty timetable gracefully (counts 0)
-        results[class_key] = analyze_timetable(class_key)
-        results[class_key]['name'] = CLASS_CONFIG[class_key]['name']
-        results[class_key]['class_key'] = class_key
+    # analysis handles empty timetable gracefully (counts 0)
+    for class_key, analysis in cached_reports('analysis').items():
+        results[class_key] = dict(analysis, name=CLASS_CONFIG[class_key]['name'], class_key=class_key)
     
     return render(request, 'class_timetable/overall_analytics.html', {'results': results})
 
 def overall_validation_view(request):
     results = {}
-    for class_key in CLASS_CONFIG:
-        results[class_key] = validate_workload_distribution(class_key)
-        results[class_key]['name'] = CLASS_CONFIG[class_key]['name']
-        results[class_key]['class_key'] = class_key
+    for class_key, validation in cached_reports('validation').items():
+        results[class_key] = dict(validation, name=CLASS_CONFIG[class_key]['name'], class_key=class_key)
         
     return render(request, 'class_timetable/overall_validation.html', {'results': results})
 
@@ -104,7 +125,7 @@ def analytics_view(request, class_key):
         return redirect('class_timetable:dashboard')
     
     cfg = CLASS_CONFIG[class_key]
-    analysis = analyze_timetable(class_key)
+    analysis = cached_reports('analysis', [class_key])[class_key]
     
     return render(request, 'class_timetable/analytics.html', {
         'class_name': cfg['name'],
@@ -112,103 +133,44 @@ def analytics_view(request, class_key):
         'analysis': analysis
     })
 
+def _page_version(request, class_key):
+    # Looked up once per request, for the validators and the view
+    if not hasattr(request, 'timetable_version'):
+        request.timetable_version = TimetableVersion.current(class_key)
+    return request.timetable_version
+
+def _page_etag(request, class_key):
+    # Pages with pending flash messages are always rendered in full
+    if class_key not in CLASS_CONFIG or len(messages.get_messages(request)):
+        return None
+    version, _ = _page_version(request, class_key)
+    # The page header shows the logged-in user
+    return f"{class_key}-{version}-{request.user.pk or 0}"
+
+def _page_last_modified(request, class_key):
+    if class_key not in CLASS_CONFIG or len(messages.get_messages(request)):
+        return None
+    return _page_version(request, class_key)[1]
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_page_etag, last_modified_func=_page_last_modified)
 def view_timetable(request, class_key):
     if class_key not in CLASS_CONFIG:
         return redirect('class_timetable:dashboard')
         
     cfg = CLASS_CONFIG[class_key]
-    TimetableModel = cfg['timetable']
-    
-    # Predefined Week Days in Order
-    DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-
-    # 1. Build Slot List including Breaks for Display
-    # Match ACADEMIC_SLOTS from utils + insert breaks
-    
-    def fmt(t): return t.strftime("%I:%M %p")
-
-    # Define rows manually to match standard output structure
-    view_rows = [
-        {'start': time(10,0), 'end': time(11,0), 'label': '10:00 am to 11:00 am', 'type': 'slot'},
-        {'start': time(11,0), 'end': time(12,0), 'label': '11:00 am to 12:00 pm', 'type': 'slot'},
-        {'label': 'LUNCH BREAK', 'type': 'break', 'start': time(12,0), 'end': time(12,45)},
-        {'start': time(12,45), 'end': time(13,45), 'label': '12:45 pm to 01:45 pm', 'type': 'slot'},
-        {'start': time(13,45), 'end': time(14,45), 'label': '01:45 pm to 02:45 pm', 'type': 'slot'},
-        {'label': 'TEA BREAK', 'type': 'break', 'start': time(14,45), 'end': time(15,0)},
-        {'start': time(15,0), 'end': time(16,0), 'label': '03:00 pm to 04:00 pm', 'type': 'slot'},
-        {'start': time(16,0), 'end': time(17,0), 'label': '04:00 pm to 05:00 pm', 'type': 'slot'},
-    ]
-
-    # 2. Fetch all entries
-    all_entries = TimetableModel.objects.all()
+    version, _ = _page_version(request, class_key)
     
-    # 3. Pivot Data: Map (Day, StartTime) -> Data
-    data_map = {}
-    for entry in all_entries:
-        k = (entry.day, entry.start_time)
-        if k not in data_map:
-            data_map[k] = []
-        data_map[k].append(entry)
-
-    # 4. Populate rows with day-wise data
-    final_rows = []
-    
-    # Track covered cells: (row_index, day)
-    covered_cells = set()
-
-    for r_idx, r in enumerate(view_rows):
-        row_data = {
-            'label': r['label'],
-            'type': r['type'],
-            'start': r.get('start'),
-            'end': r.get('end'),
-            'days': []
-        }
-        
-        if r['type'] == 'slot':
-            t_start = r['start']
-            
-            for day in DAY_ORDER:
-                if (r_idx, day) in covered_cells:
-                    row_data['days'].append({'skipped': True})
-                    continue
-                
-                entries = data_map.get((day, t_start), [])
-                
-                # Sort by batch
-                entries.sort(key=lambda x: x.batch)
-                
-                is_practical = (len(entries) > 1)
-                rowspan = 1
-                
-                # Check for merge (Practical Block of 2 hours)
-                # Rows 0, 3, 6 are start of blocks in our view_rows structure
-                if is_practical and r_idx in [0, 3, 6] and (r_idx + 1) < len(view_rows):
-                    next_row = view_rows[r_idx+1]
-                    if next_row['type'] == 'slot':
-                        next_t_start = next_row['start']
-                        next_entries = data_map.get((day, next_t_start), [])
-                        
-                        # If next slot is also practical, assume valid block merge
-                        if len(next_entries) > 1:
-                            rowspan = 2
-                            covered_cells.add((r_idx + 1, day))
-
-                cell_info = {
-                    'entries': entries, 
-                    'is_practical': is_practical,
-                    'rowspan': rowspan,
-                    'skipped': False
-                }
-                row_data['days'].append(cell_info)
-        
-        final_rows.append(row_data)
+    # Precomputed when the timetable was saved; only loaded when the
+    # rendered grid of this version is not cached
+    grid = SimpleLazyObject(lambda: load_display_grid(class_key))
 
     return render(request, 'class_timetable/view.html', {
         'class_name': cfg['name'],
         'class_key': class_key,
-        'timetable_rows': final_rows,
-        'days': DAY_ORDER
+        'grid': grid,
+        'version': version,
+        'grid_cache_timeout': getattr(settings, 'TIMETABLE_GRID_CACHE_TIMEOUT', 3600),
     })
 
 def delete_timetable(request, class_key):
@@ -216,7 +178,98 @@ def delete_timetable(request, class_key):
         return redirect('class_timetable:dashboard')
         
     cfg = CLASS_CONFIG[class_key]
-    TimetableModel = cfg['timetable']
-    TimetableModel.objects.all().delete()
+    with transaction.atomic():
+        class_entries(class_key).delete()
+        TimetableSnapshot.objects.filter(class_key=class_key).delete()
+        TimetableVersion.bump(class_key)
     messages.warning(request, f"Timetable deleted for {cfg['name']}")
     return redirect('class_timetable:dashboard')
+
+def export_view(request, source, fmt):
+    """
+    Downloads the timetables of a source ('class_timetable',
+    'class_timetable_v2' or 'timetable') as csv / json / xlsx;
+    ?class=<class key or AcademicClass id> limits it to one class.
+    """
+    if source not in EXPORT_SOURCES or fmt not in EXPORT_FORMATS:
+        return redirect('class_timetable:dashboard')
+
+    try:
+        class_key = export_class(source, request.GET.get('class'))
+    except ValueError as e:
+        messages.error(request, f"Error: {e}")
+        return redirect('class_timetable:dashboard')
+    columns, rows = export_rows(source, class_key)
+    content_type, chunks = EXPORT_FORMATS[fmt]
+    filename = f"{source}-{class_key or 'all'}.{fmt}"
+
+    if chunks is None:
+        output = tempfile.TemporaryFile()
+        try:
+            write_xlsx(columns, rows, output)
+        except ImportError:
+            output.close()
+            messages.error(request, "Error: XLSX export requires xlsxwriter")
+            return redirect('class_timetable:dashboard')
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
+
+    return StreamingHttpResponse(
+        chunks(columns, rows),
+        content_type=content_type,
+        headers={'Content-Disposition': content_disposition_header(True, filename)},
+    )
+
+def _calendar_response(key, lines, filename):
+    # Served from the cache until the timetables change; otherwise the feed
+    # is streamed and cached once complete
+    content = cache.get(key)
+    if content is None:
+        response = StreamingHttpResponse(cached_stream(key, lines()), content_type='text/calendar; charset=utf-8')
+    else:
+        response = HttpResponse(content, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(False, filename)
+    return response
+
+def class_calendar_view(request, class_key, batch=None):
+    # Feeds are fetched by calendar apps: unknown classes and batches are
+    # 404s, and never get a cache entry of their own
+    cfg = CLASS_CONFIG.get(class_key)
+    if cfg is None or (batch is not None and batch not in cfg['batches']):
+        raise Http404("No such class or batch")
+
+    version, _ = TimetableVersion.current(class_key)
+    key = feed_cache_key('class', class_key, batch or 'ALL', version)
+    name = f"{cfg['name']} {batch}" if batch else cfg['name']
+    return _calendar_response(
+        key,
+        lambda: feed_lines(name, class_feed_entries(class_key, batch)),
+        f"{class_key}-{batch or 'all'}.ics",
+    )
+
+def teacher_calendar_view(request, teacher_id):
+    teacher = get_object_or_404(Teacher, id=teacher_id)
+    # A teacher lectures in several classes
+    versions = timetable_versions()
+    key = feed_cache_key('teacher', teacher.id, '.'.join(str(versions[k]) for k in CLASS_CONFIG))
+    class_names = {class_key: cfg['name'] for class_key, cfg in CLASS_CONFIG.items()}
+    return _calendar_response(
+        key,
+        lambda: feed_lines(teacher.name, teacher_feed_entries(teacher), class_names),
+        f"teacher-{teacher.id}.ics",
+    )
+
+def teacher_list_view(request):
+    teachers = Teacher.objects.annotate(hours=Count('classtimetableentry')).order_by('name')
+    return render(request, 'class_timetable/teachers.html', {'teachers': teachers})
+
+def teacher_timetable_view(request, teacher_id):
+    teacher = get_object_or_404(Teacher, id=teacher_id)
+    return render(request, 'class_timetable/teacher.html', {
+        'teacher': teacher,
+        'week': teacher_week(teacher),
+    })
+
+def teacher_timetable_json(request, teacher_id):
+    teacher = get_object_or_404(Teacher, id=teacher_id)
+    return JsonResponse(dict(teacher_week(teacher), teacher={'id': teacher.id, 'name': teacher.name}))
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+# Old per-class timetable models -> class_key of the unified table
+OLD_TIMETABLES = {
+    'TycoATimetable': 'tyco_a',
+    'TycoBTimetable': 'tyco_b',
+    'SycoATimetable': 'syco_a',
+    'SycoBTimetable': 'syco_b',
+}
+
+
+def copy_timetables(apps, schema_editor):
+    Entry = apps.get_model('class_timetable_v2', 'ClassTimetableEntry')
+    rows = []
+    for model_name, class_key in OLD_TIMETABLES.items():
+        Old = apps.get_model('class_timetable_v2', model_name)
+        for old in Old.objects.all():
+            rows.append(Entry(
+                class_key=class_key, day=old.day,
+                start_time=old.start_time, end_time=old.end_time,
+                subject_name=old.subject_name, teacher_name=old.teacher_name,
+                room=old.room, batch=old.batch
+            ))
+    Entry.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable_v2', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassTimetableEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(choices=[('Monday', 'Monday'), ('Tuesday', 'Tuesday'), ('Wednesday', 'Wednesday'), ('Thursday', 'Thursday'), ('Friday', 'Friday'), ('Saturday', 'Saturday')], max_length=20)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('subject_name', models.CharField(max_length=100)),
+                ('teacher_name', models.CharField(max_length=100)),
+                ('room', models.CharField(blank=True, max_length=50, null=True)),
+                ('batch', models.CharField(default='ALL', max_length=10)),
+                ('class_key', models.CharField(max_length=20)),
+            ],
+        ),
+        migrations.RunPython(copy_timetables, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='SycoATimetable',
+        ),
+        migrations.DeleteModel(
+            name='SycoBTimetable',
+        ),
+        migrations.DeleteModel(
+            name='TycoATimetable',
+        ),
+        migrations.DeleteModel(
+            name='TycoBTimetable',
+        ),
+        migrations.AddIndex(
+            model_name='classtimetableentry',
+            index=models.Index(fields=['teacher_name', 'day', 'start_time'], name='ct2_entry_teacher_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classtimetableentry',
+            index=models.Index(fields=['class_key', 'day', 'start_time'], name='ct2_entry_class_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable_v2', '0002_classtimetableentry'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='classtimetableentry',
+            name='ct2_entry_class_slot_idx',
+        ),
+        migrations.AddIndex(
+            model_name='classtimetableentry',
+            index=models.Index(fields=['class_key', 'subject_name', 'batch'], name='ct2_entry_subject_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='classtimetableentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('teacher_name__in', ['-', 'Free']), _negated=True), fields=('teacher_name', 'day', 'start_time'), name='ct2_entry_unique_teacher_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='classtimetableentry',
+            constraint=models.UniqueConstraint(fields=('class_key', 'day', 'start_time', 'batch'), name='ct2_entry_unique_cell'),
+        ),
+    ]
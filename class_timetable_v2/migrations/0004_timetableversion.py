@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('class_timetable_v2', '0003_classtimetableentry_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_key', models.CharField(max_length=20, unique=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
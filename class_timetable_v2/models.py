@@ -1,4 +1,5 @@
 from django.db import models
+from scheduling.versions import TimetableVersionBase
 
 # Common choices
 DAYS = [
@@ -10,6 +11,16 @@ DAYS = [
     ('Saturday', 'Saturday'),
 ]
 
+# Teacher names used for placeholder rows (Library / empty batches);
+# they may appear in many cells at once
+PLACEHOLDER_TEACHERS = ['-', 'Free']
+
+class TimetableVersion(TimetableVersionBase):
+    """
+    Version of a class timetable, bumped whenever it changes; timetable
+    pages are validated and cached by it.
+    """
+
 # Base Abstract Classes
 class ClassInputBase(models.Model):
     subject_name = models.CharField(max_length=100)
@@ -48,23 +59,40 @@ class ClassTimetableBase(models.Model):
 class TycoAInput(ClassInputBase):
     pass
 
-class TycoATimetable(ClassTimetableBase):
-    pass
-
 class TycoBInput(ClassInputBase):
     pass
 
-class TycoBTimetable(ClassTimetableBase):
-    pass
-
 class SycoAInput(ClassInputBase):
     pass
 
-class SycoATimetable(ClassTimetableBase):
-    pass
-
 class SycoBInput(ClassInputBase):
     pass
 
-class SycoBTimetable(ClassTimetableBase):
-    pass
+# --- Timetables of all classes ---
+class ClassTimetableEntry(ClassTimetableBase):
+    # Key of the class in utils.CLASS_CONFIG, e.g. 'tyco_a'
+    class_key = models.CharField(max_length=20)
+
+    class Meta:
+        indexes = [
+            # Cross-class teacher clash checks
+            models.Index(fields=['teacher_name', 'day', 'start_time'], name='ct2_entry_teacher_slot_idx'),
+            # Workload validation: lectures of a subject / batch
+            models.Index(fields=['class_key', 'subject_name', 'batch'], name='ct2_entry_subject_idx'),
+        ]
+        constraints = [
+            # A teacher is in one place at a time, across all classes. v2
+            # has no Teacher model (its generator books teachers by name),
+            # so the rule stays on teacher_name
+            models.UniqueConstraint(
+                fields=['teacher_name', 'day', 'start_time'],
+                condition=~models.Q(teacher_name__in=PLACEHOLDER_TEACHERS),
+                name='ct2_entry_unique_teacher_slot',
+            ),
+            # One row per (class, day, slot, batch) cell; also serves as the
+            # index for loading / pivoting one class timetable
+            models.UniqueConstraint(
+                fields=['class_key', 'day', 'start_time', 'batch'],
+                name='ct2_entry_unique_cell',
+            ),
+        ]
@@ -1,3 +1,40 @@
+from datetime import time
+
 from django.test import TestCase
 
-# Create your tests here.
+from timetable.models import Room
+
+from .models import ClassTimetableEntry
+from .utils import assign_rooms
+
+
+def row(day, start, end, batch='ALL', teacher='T1'):
+    return ClassTimetableEntry(
+        class_key='tyco_a', day=day, start_time=start, end_time=end,
+        subject_name='OSY', teacher_name=teacher, batch=batch,
+    )
+
+
+class AssignRoomsTests(TestCase):
+    def test_lectures_and_lab_blocks_get_rooms(self):
+        Room.objects.create(room_number='CR-1', capacity=60, room_type='CLASSROOM')
+        Room.objects.create(room_number='LAB-1', capacity=20, room_type='LAB')
+        rows = [
+            row('Monday', time(10, 0), time(11, 0)),
+            row('Monday', time(12, 45), time(13, 45), batch='A1'),
+            row('Monday', time(13, 45), time(14, 45), batch='A1'),
+            row('Monday', time(15, 0), time(16, 0), teacher='-'),
+        ]
+        self.assertEqual(assign_rooms(rows), 0)
+        self.assertEqual([r.room for r in rows], ['CR-1', 'LAB-1', 'LAB-1', None])
+
+    def test_sessions_without_a_room_are_counted(self):
+        Room.objects.create(room_number='CR-1', capacity=60, room_type='CLASSROOM')
+        rows = [
+            row('Monday', time(10, 0), time(11, 0), batch='A1'),
+            row('Monday', time(11, 0), time(12, 0), batch='A1'),
+            row('Monday', time(10, 0), time(11, 0), batch='A2', teacher='T2'),
+            row('Monday', time(11, 0), time(12, 0), batch='A2', teacher='T2'),
+        ]
+        self.assertEqual(assign_rooms(rows), 2)
+        self.assertTrue(all(r.room is None for r in rows))
@@ -1,12 +1,13 @@
 import random
 import itertools
 from datetime import time, datetime, timedelta
+from django.db import transaction
+from scheduling.occupancy import TeacherOccupancy as SharedTeacherOccupancy
+from scheduling.rooms import LAB, CLASSROOM, Session, RoomSpec, cell_bit, allocate_rooms, no_room_warning
+from timetable.models import Room
 from .models import (
-    TycoAInput, TycoATimetable,
-    TycoBInput, TycoBTimetable,
-    SycoAInput, SycoATimetable,
-    SycoBInput, SycoBTimetable,
-    DAYS
+    TycoAInput, TycoBInput, SycoAInput, SycoBInput,
+    ClassTimetableEntry, TimetableVersion, PLACEHOLDER_TEACHERS, DAYS
 )
 
 # === CONFIGURATION ===
@@ -34,48 +35,54 @@ ACADEMIC_SLOTS = [
     (time(16, 0), time(17, 0)),    # Slot 5 (4:00 PM - 5:00 PM)
 ]
 
+# strength: students of the class, for room capacities
 CLASS_CONFIG = {
-    'tyco_a': {'input': TycoAInput, 'timetable': TycoATimetable, 'name': 'TYCO A'},
-    'tyco_b': {'input': TycoBInput, 'timetable': TycoBTimetable, 'name': 'TYCO B'},
-    'syco_a': {'input': SycoAInput, 'timetable': SycoATimetable, 'name': 'SYCO A'},
-    'syco_b': {'input': SycoBInput, 'timetable': SycoBTimetable, 'name': 'SYCO B'},
+    'tyco_a': {'input': TycoAInput, 'name': 'TYCO A', 'strength': 60},
+    'tyco_b': {'input': TycoBInput, 'name': 'TYCO B', 'strength': 60},
+    'syco_a': {'input': SycoAInput, 'name': 'SYCO A', 'strength': 60},
+    'syco_b': {'input': SycoBInput, 'name': 'SYCO B', 'strength': 60},
 }
 
-def check_teacher_conflict_bulk(teacher_list, day, start_time, exclude_class_key):
+def class_entries(class_key):
     """
-    Returns True if ANY teacher in the list is busy in another class.
+    Timetable rows of one class (all classes share ClassTimetableEntry).
     """
-    for key, cfg in CLASS_CONFIG.items():
-        if key == exclude_class_key:
-            continue
-        
-        # Check timetable of other class
-        busy = cfg['timetable'].objects.filter(
-            teacher_name__in=teacher_list, 
-            day=day, 
-            start_time=start_time
-        ).exists()
-        
-        if busy:
-            return True
-    return False
+    return ClassTimetableEntry.objects.filter(class_key=class_key)
+
+class TeacherOccupancy(SharedTeacherOccupancy):
+    """
+    Teacher bookings keyed by teacher_name (this app has no Teacher model);
+    slots are ACADEMIC_SLOTS indexes. Placeholder names are never booked.
+    """
+    def __init__(self):
+        super().__init__([d[0] for d in DAYS], range(len(ACADEMIC_SLOTS)), ignore=PLACEHOLDER_TEACHERS)
 
-def check_single_conflict(teacher, day, start_time, exclude_class_key):
-    return check_teacher_conflict_bulk([teacher], day, start_time, exclude_class_key)
+    @classmethod
+    def from_other_classes(cls, exclude_class_key):
+        """
+        Loads the timetables of every other class (one query).
+        """
+        occupancy = cls()
+        slot_index = {s[0]: i for i, s in enumerate(ACADEMIC_SLOTS)}
+        rows = ClassTimetableEntry.objects.exclude(
+            class_key=exclude_class_key
+        ).exclude(
+            teacher_name__in=PLACEHOLDER_TEACHERS
+        ).values_list('teacher_name', 'day', 'start_time')
+        for teacher, day, start_time in rows:
+            if start_time in slot_index:
+                occupancy.occupy([teacher], day, [slot_index[start_time]])
+        return occupancy
 
 def generate_timetable_for_class(class_key):
     if class_key not in CLASS_CONFIG:
         return False, "Invalid Class"
 
     InputModel = CLASS_CONFIG[class_key]['input']
-    TimetableModel = CLASS_CONFIG[class_key]['timetable']
-
-    # 1. Clear Timetable
-    TimetableModel.objects.all().delete()
 
-    # 2. Fetch Inputs & Categorize
-    # 2. Fetch Inputs & Categorize
+    # 1. Fetch Inputs & Categorize (the old timetable is replaced in STEP D)
     all_inputs = list(InputModel.objects.all())
+    occupancy = TeacherOccupancy.from_other_classes(class_key)
     
     # Logic Update: A single input can have BOTH Theory and Practical credits.
     # We don't split inputs into "labs" list and "theories" list anymore.
@@ -184,8 +191,7 @@ def generate_timetable_for_class(class_key):
                     
                 # 2. Conflict Check (External Timetables)
                 # Check for both hours
-                if check_teacher_conflict_bulk(list(teachers), day, ACADEMIC_SLOTS[s1][0], class_key): continue
-                if check_teacher_conflict_bulk(list(teachers), day, ACADEMIC_SLOTS[s2][0], class_key): continue
+                if occupancy.is_busy(teachers, day, [s1, s2]): continue
                 
                 # Found valid!
                 found_trio = [c1, c2, c3]
@@ -195,6 +201,7 @@ def generate_timetable_for_class(class_key):
                 # Place
                 grid[(day, s1)] = {'type': 'PR', 'trio': found_trio, 'batches': ['A1', 'A2', 'A3']}
                 grid[(day, s2)] = {'type': 'PR', 'trio': found_trio, 'batches': ['A1', 'A2', 'A3']}
+                occupancy.occupy([c.teacher_name for c in found_trio], day, [s1, s2])
                 
                 # Remove from pools
                 # Remove FIRST instance of object found in pool list
@@ -238,10 +245,9 @@ def generate_timetable_for_class(class_key):
             
             for i in candidates_indices:
                 candidate = theory_pool[i]
-                start_time = ACADEMIC_SLOTS[slot_idx][0]
                 
                 # 1. Conflict Check
-                if check_single_conflict(candidate.teacher_name, day, start_time, class_key):
+                if occupancy.is_busy([candidate.teacher_name], day, [slot_idx]):
                     continue
                     
                 # 2. Daily Limit Check (Max 2 per day)
@@ -261,6 +267,7 @@ def generate_timetable_for_class(class_key):
             
             if placed_t:
                 grid[(day, slot_idx)] = {'type': 'TH', 'subject': placed_t, 'batch': 'ALL'}
+                occupancy.occupy([placed_t.teacher_name], day, [slot_idx])
             else:
                  # Could not fill slot with current pool (conflicts or limits)
                  # Leave empty for Extra lecture
@@ -273,10 +280,15 @@ def generate_timetable_for_class(class_key):
     for day in days_list:
         for i in range(len(ACADEMIC_SLOTS)):
             if (day, i) not in grid:
-                # Pick a random subject for extra lecture
-                if extra_candidates:
-                    rand_subj = random.choice(extra_candidates)
+                # Pick a random subject whose teacher is free for extra lecture
+                free_candidates = [
+                    c for c in extra_candidates
+                    if not occupancy.is_busy([c.teacher_name], day, [i])
+                ]
+                if free_candidates:
+                    rand_subj = random.choice(free_candidates)
                     grid[(day, i)] = {'type': 'EXTRA', 'subject': rand_subj, 'batch': 'ALL'}
+                    occupancy.occupy([rand_subj.teacher_name], day, [i])
                 else:
                     # Fallback if no inputs
                     grid[(day, i)] = {'type': 'FILLER', 'subject_name': 'Free', 'batch': 'ALL'}
@@ -301,6 +313,7 @@ def generate_timetable_for_class(class_key):
         return SUBJECT_ABBR.get(name, name[:3].upper())
 
     # --- STEP D: SAVE TO DB ---
+    rows = []
     for item in grid.items():
         key, data = item
         day, slot_idx = key
@@ -319,10 +332,10 @@ def generate_timetable_for_class(class_key):
 
             t_name = subj.teacher_name
             
-            TimetableModel.objects.create(
-                day=day, start_time=start, end_time=end,
+            rows.append(ClassTimetableEntry(
+                class_key=class_key, day=day, start_time=start, end_time=end,
                 subject_name=s_name, teacher_name=t_name, batch='ALL'
-            )
+            ))
 
         elif data['type'] == 'PR':
             trio_labs = data['trio']
@@ -335,15 +348,168 @@ def generate_timetable_for_class(class_key):
                     s_name = "Free"
                     t_name = "-"
                 
-                TimetableModel.objects.create(
-                    day=day, start_time=start, end_time=end,
+                rows.append(ClassTimetableEntry(
+                    class_key=class_key, day=day, start_time=start, end_time=end,
                     subject_name=s_name, teacher_name=t_name, batch=batch_code
-                )
+                ))
         
         elif data['type'] == 'FILLER':
-            TimetableModel.objects.create(
-                day=day, start_time=start, end_time=end,
+            rows.append(ClassTimetableEntry(
+                class_key=class_key, day=day, start_time=start, end_time=end,
                 subject_name="Library", teacher_name="-", batch='ALL'
-            )
+            ))
+
+    unroomed = assign_rooms(rows, others=ClassTimetableEntry.objects.exclude(class_key=class_key))
+    save_timetable(class_key, rows)
+
+    return True, no_room_warning(unroomed) or "Generated"
+
+def assign_rooms(rows, others=None):
+    """
+    Fills the room of the timetable rows with timetable.Room numbers:
+    classrooms for whole-class lectures, labs for practical batches (both
+    slots of a block share the lab), none for Library / free rows.
+    Rooms used at the same time by `others` (rows of other classes) are
+    avoided. Returns the number of sessions left without a room.
+    """
+    slot_index = {start: i for i, (start, _) in enumerate(ACADEMIC_SLOTS)}
+    day_index = {day: i for i, (day, _) in enumerate(DAYS)}
+
+    def cell(day, start):
+        return cell_bit(day_index[day], slot_index[start], len(ACADEMIC_SLOTS))
+
+    occupancy = {}
+    if others is not None:
+        for room, day, start in others.filter(room__isnull=False).values_list('room', 'day', 'start_time'):
+            occupancy[room] = occupancy.get(room, 0) | cell(day, start)
+
+    # Group the rows into sessions: [rows], group size, room type. Practical
+    # blocks always start on an even slot (see STEP A)
+    sessions = []
+    blocks = {}
+    for row in rows:
+        if row.teacher_name in PLACEHOLDER_TEACHERS:
+            continue
+        strength = CLASS_CONFIG[row.class_key]['strength']
+        if row.batch == 'ALL':
+            sessions.append(([row], strength, CLASSROOM))
+            continue
+        idx = slot_index[row.start_time]
+        key = (row.day, row.batch, idx - idx % 2)
+        if key not in blocks:
+            # Every class has three batches, A1-A3
+            blocks[key] = ([], -(-strength // 3), LAB)
+            sessions.append(blocks[key])
+        blocks[key][0].append(row)
+
+    allocation = allocate_rooms(
+        [RoomSpec(*room) for room in Room.objects.values_list('room_number', 'capacity', 'room_type')],
+        [
+            Session(i, sum(cell(r.day, r.start_time) for r in session_rows), size, room_type)
+            for i, (session_rows, size, room_type) in enumerate(sessions)
+        ],
+        occupancy,
+    )
+    for i, (session_rows, _, _) in enumerate(sessions):
+        for row in session_rows:
+            row.room = allocation[i]
+    return sum(1 for room in allocation.values() if room is None)
+
+def save_timetable(class_key, rows):
+    """
+    Replaces the stored timetable of the class with `rows` in one transaction.
+    """
+    with transaction.atomic():
+        class_entries(class_key).delete()
+        ClassTimetableEntry.objects.bulk_create(rows)
+        TimetableVersion.bump(class_key)
+
+def build_display_grid(entries):
+    """
+    Pivots timetable rows into the rows / day cells of the timetable page
+    (same signature as class_timetable.utils.build_display_grid; this app
+    renders the rows directly instead of storing a JSON snapshot).
+    """
+    # Predefined Week Days in Order
+    DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+    # 1. Build Slot List including Breaks for Display
+    # Match ACADEMIC_SLOTS from utils + insert breaks
+    
+    def fmt(t): return t.strftime("%I:%M %p")
+
+    # Define rows manually to match standard output structure
+    view_rows = [
+        {'start': time(10,0), 'end': time(11,0), 'label': '10:00 am to 11:00 am', 'type': 'slot'},
+        {'start': time(11,0), 'end': time(12,0), 'label': '11:00 am to 12:00 pm', 'type': 'slot'},
+        {'label': 'LUNCH BREAK', 'type': 'break', 'start': time(12,0), 'end': time(12,45)},
+        {'start': time(12,45), 'end': time(13,45), 'label': '12:45 pm to 01:45 pm', 'type': 'slot'},
+        {'start': time(13,45), 'end': time(14,45), 'label': '01:45 pm to 02:45 pm', 'type': 'slot'},
+        {'label': 'TEA BREAK', 'type': 'break', 'start': time(14,45), 'end': time(15,0)},
+        {'start': time(15,0), 'end': time(16,0), 'label': '03:00 pm to 04:00 pm', 'type': 'slot'},
+        {'start': time(16,0), 'end': time(17,0), 'label': '04:00 pm to 05:00 pm', 'type': 'slot'},
+    ]
+
+    # 2. Pivot Data: Map (Day, StartTime) -> Data
+    data_map = {}
+    for entry in entries:
+        k = (entry.day, entry.start_time)
+        if k not in data_map:
+            data_map[k] = []
+        data_map[k].append(entry)
+
+    # 3. Populate rows with day-wise data
+    final_rows = []
+    
+    # Track covered cells: (row_index, day)
+    covered_cells = set()
+
+    for r_idx, r in enumerate(view_rows):
+        row_data = {
+            'label': r['label'],
+            'type': r['type'],
+            'start': r.get('start'),
+            'end': r.get('end'),
+            'days': []
+        }
+        
+        if r['type'] == 'slot':
+            t_start = r['start']
+            
+            for day in DAY_ORDER:
+                if (r_idx, day) in covered_cells:
+                    row_data['days'].append({'skipped': True})
+                    continue
+                
+                entries = data_map.get((day, t_start), [])
+                
+                # Sort by batch
+                entries.sort(key=lambda x: x.batch)
+                
+                is_practical = (len(entries) > 1)
+                rowspan = 1
+                
+                # Check for merge (Practical Block of 2 hours)
+                # Rows 0, 3, 6 are start of blocks in our view_rows structure
+                if is_practical and r_idx in [0, 3, 6] and (r_idx + 1) < len(view_rows):
+                    next_row = view_rows[r_idx+1]
+                    if next_row['type'] == 'slot':
+                        next_t_start = next_row['start']
+                        next_entries = data_map.get((day, next_t_start), [])
+                        
+                        # If next slot is also practical, assume valid block merge
+                        if len(next_entries) > 1:
+                            rowspan = 2
+                            covered_cells.add((r_idx + 1, day))
+
+                cell_info = {
+                    'entries': entries, 
+                    'is_practical': is_practical,
+                    'rowspan': rowspan,
+                    'skipped': False
+                }
+                row_data['days'].append(cell_info)
+        
+        final_rows.append(row_data)
 
-    return True, "Generated"
+    return {'rows': final_rows, 'days': DAY_ORDER}
@@ -0,0 +1,112 @@
+"""
+Real-time chat: a websocket per open conversation.
+
+Both participants of a conversation join one group; every new Message,
+sent over the socket or posted with the form, is pushed to the group as a
+single message delta instead of reloading the page.
+"""
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import formats, timezone
+
+from .models import CustomUser, Message
+
+
+CHAT_MAX_MESSAGE_LENGTH = getattr(settings, 'CHAT_MAX_MESSAGE_LENGTH', 2000)
+
+
+def message_text(value):
+    """
+    Text of a new message, stripped; raises ValueError if it is longer
+    than CHAT_MAX_MESSAGE_LENGTH. Shared by the socket and the chat form.
+    """
+    text = str(value or '').strip()
+    if len(text) > CHAT_MAX_MESSAGE_LENGTH:
+        raise ValueError(f"Messages are limited to {CHAT_MAX_MESSAGE_LENGTH} characters")
+    return text
+
+
+def chat_group(user_id, other_user_id):
+    low, high = sorted([user_id, other_user_id])
+    return f"chat_{low}_{high}"
+
+
+def message_payload(message):
+    """
+    The delta pushed for a new message; `display_time` is formatted as the
+    chat template shows timestamps.
+    """
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'text': message.text,
+        'image': message.image.url if message.image else None,
+        'timestamp': message.timestamp.isoformat(),
+        'display_time': formats.date_format(timezone.localtime(message.timestamp), 'DATETIME_FORMAT'),
+    }
+
+
+def broadcast_message(message):
+    """
+    Pushes a message saved outside the consumer (the chat form) to the open
+    sockets of its conversation.
+    """
+    async_to_sync(get_channel_layer().group_send)(
+        chat_group(message.sender_id, message.receiver_id),
+        {'type': 'chat.message', 'message': message_payload(message)},
+    )
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/messages/<user_id>/: the conversation of the logged-in user with
+    user_id. Receives {"text": ...}, saves it and sends the delta to both
+    participants; invalid frames get an {"error": ...} reply.
+    """
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        self.other_user = await self.get_user(self.scope['url_route']['kwargs']['user_id'])
+        if self.other_user is None:
+            await self.close()
+            return
+
+        self.group = chat_group(self.user.id, self.other_user.id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            await self.send_json({'error': "Expected an object with a 'text' field"})
+            return
+        try:
+            text = message_text(content.get('text'))
+        except ValueError as e:
+            await self.send_json({'error': str(e)})
+            return
+        if not text:
+            return
+        payload = await self.save_message(text)
+        await self.channel_layer.group_send(self.group, {'type': 'chat.message', 'message': payload})
+
+    async def chat_message(self, event):
+        await self.send_json(event['message'])
+
+    @database_sync_to_async
+    def get_user(self, user_id):
+        return CustomUser.objects.filter(id=user_id).first()
+
+    @database_sync_to_async
+    def save_message(self, text):
+        message = Message.objects.create(sender=self.user, receiver=self.other_user, text=text)
+        return message_payload(message)
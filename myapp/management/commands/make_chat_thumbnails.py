@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from myapp.models import Message
+from myapp.thumbnails import save_thumbnail
+
+
+class Command(BaseCommand):
+    help = "Creates the missing thumbnails of chat image uploads (e.g. images sent before thumbnails existed)"
+
+    def handle(self, *args, **options):
+        messages = Message.objects.exclude(image='').exclude(image__isnull=True).filter(
+            Q(thumbnail='') | Q(thumbnail__isnull=True)
+        )
+        made = failed = 0
+        for message in messages.iterator():
+            if save_thumbnail(message):
+                made += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Created {made} thumbnails"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} images could not be read"))
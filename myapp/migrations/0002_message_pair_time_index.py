@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'timestamp'], name='chat_message_pair_time_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_message_pair_time_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='thumbnail',
+            field=models.ImageField(blank=True, height_field='thumbnail_height', null=True, upload_to='messages/thumbs/', width_field='thumbnail_width'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
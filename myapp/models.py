@@ -27,9 +27,22 @@ class Message(models.Model):
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='received_messages', null=True, blank=True)
     text = models.TextField(blank=True)
     image = models.ImageField(upload_to='messages/', blank=True, null=True)
+    # Resized copy of the image shown in the chat, made in the background
+    thumbnail = models.ImageField(
+        upload_to='messages/thumbs/', blank=True, null=True,
+        width_field='thumbnail_width', height_field='thumbnail_height'
+    )
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     is_group_message = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of a conversation, newest first
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='chat_message_pair_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender} to {self.receiver or 'Group'}"
 
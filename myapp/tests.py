@@ -1,3 +1,59 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from . import views
+from .models import CustomUser, Message
+from .views import _chat_cursor, conversation_page
+
+
+class ConversationPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw', name='Alice')
+        cls.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw', name='Bob')
+        cls.carol = CustomUser.objects.create_user(username='carol', email='carol@example.com', password='pw', name='Carol')
+
+        messages = Message.objects.bulk_create([
+            Message(sender=cls.alice if i % 2 else cls.bob, receiver=cls.bob if i % 2 else cls.alice, text=f"m{i}")
+            for i in range(23)
+        ])
+        # Groups of three messages share a timestamp, so pages end inside them
+        now = timezone.now()
+        for i, message in enumerate(messages):
+            Message.objects.filter(pk=message.pk).update(timestamp=now + timedelta(seconds=i // 3))
+        Message.objects.create(sender=cls.alice, receiver=cls.carol, text="other conversation")
+
+    def walk(self):
+        """
+        Texts of every page, newest page first, following the cursors.
+        """
+        pages = []
+        cursor = None
+        while True:
+            page, older = conversation_page(self.alice, self.bob, cursor)
+            pages.append([message.text for message in page])
+            if older is None:
+                return pages
+            cursor = _chat_cursor(RequestFactory().get('/', data=QueryDict(older)))
+            self.assertIsNotNone(cursor)
+
+    def test_pages_neither_skip_nor_repeat(self):
+        with mock.patch.object(views, 'CHAT_PAGE_SIZE', 5):
+            pages = self.walk()
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        texts = [text for page in reversed(pages) for text in page]
+        self.assertEqual(texts, [f"m{i}" for i in range(23)])
+
+    def test_single_page_has_no_cursor(self):
+        page, older = conversation_page(self.bob, self.alice)
+        self.assertEqual(len(page), 23)
+        self.assertIsNone(older)
+
+    def test_invalid_cursor_is_ignored(self):
+        for query in [{}, {'before': 'yesterday', 'before_id': '3'}, {'before': '2025-01-01T10:00:00', 'before_id': 'x'}]:
+            self.assertIsNone(_chat_cursor(RequestFactory().get('/', data=query)))
@@ -0,0 +1,83 @@
+"""
+Thumbnails of chat image uploads.
+
+Uploads are resized and recompressed as JPEG by Pillow in a background
+thread pool, so posting a message does not wait for them. Thumbnail file
+names are content hashes: a URL never changes content and can be cached
+for good.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Message
+
+THUMBNAIL_SIZE = getattr(settings, 'CHAT_THUMBNAIL_SIZE', (480, 480))
+THUMBNAIL_QUALITY = getattr(settings, 'CHAT_THUMBNAIL_QUALITY', 75)
+
+_executor = None
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'CHAT_THUMBNAIL_WORKERS', 2),
+            thread_name_prefix='chat-thumbnails',
+        )
+    return _executor
+
+def render_thumbnail(source):
+    """
+    JPEG bytes of the image in `source` (a file), at most THUMBNAIL_SIZE,
+    upright per its EXIF orientation, transparency flattened on white.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+def save_thumbnail(message):
+    """
+    Creates the thumbnail of a message's image; unreadable images are left
+    without one. Returns True if a thumbnail was saved.
+    """
+    try:
+        with message.image.open('rb') as source:
+            data = render_thumbnail(source)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+
+    name = hashlib.sha256(data).hexdigest()[:20] + '.jpg'
+    message.thumbnail.save(name, ContentFile(data), save=False)
+    message.save(update_fields=['thumbnail', 'thumbnail_width', 'thumbnail_height'])
+    return True
+
+def make_thumbnail(message_id):
+    # Runs in the pool; worker threads would otherwise keep a connection open
+    try:
+        message = Message.objects.filter(id=message_id).first()
+        if message is not None and message.image and not message.thumbnail:
+            save_thumbnail(message)
+    finally:
+        connection.close()
+
+def schedule_thumbnail(message):
+    """
+    Queues the thumbnail of a new message once it is committed.
+    """
+    if message.image:
+        transaction.on_commit(lambda: executor().submit(make_thumbnail, message.id))
@@ -1,9 +1,11 @@
 # users/urls.py
-from django.urls import path
+from django.urls import path, re_path
 from django.contrib.auth import views as auth_views
 from .views import *
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
 
 urlpatterns = [
     path('', base, name='base'),
@@ -28,6 +30,7 @@ urlpatterns = [
     path('dashboard/', dashboard, name='dashboard'),
     path('messages/', user_list_view, name='user_list'),
     path('messages/<int:user_id>/', chat_view_by_id, name='chat'),
+    path('messages/<int:user_id>/older/', chat_older_view, name='chat_older'),
     
     path('feedback/', feedback_view, name='feedback'),
     path('feedbacks/', view_feedbacks, name='view_feedbacks'),
@@ -35,5 +38,17 @@ urlpatterns = [
     # prediction # mainApplicationFunctionality20240625
     
     
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+if settings.DEBUG:
+    # Thumbnail names are content hashes, so browsers may keep them for good
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}messages/thumbs/(?P<path>.*)$",
+            cache_control(public=True, max_age=60 * 60 * 24 * 365, immutable=True)(serve),
+            {'document_root': settings.MEDIA_ROOT / 'messages' / 'thumbs'},
+        ),
+    ]
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -5,11 +5,16 @@ from django.contrib.auth.decorators import login_required
 
 from django.db.models import Q
 from django.conf import settings
+from django.http import HttpResponseBadRequest
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
 
 from django.contrib.auth import get_user_model
 
 from .forms import *
 from .models import *
+from .consumers import CHAT_MAX_MESSAGE_LENGTH, broadcast_message, message_text
+from .thumbnails import schedule_thumbnail
 
 def base(request):
     return render(request, 'base.html')
@@ -61,40 +66,11 @@ def edit_profile(request):
 
 # dashboard
 from django.shortcuts import render
-from timetable.models import (
-    AcademicClass, Subject, Room,
-    Batch, TimetableEntry, Day
-)
-from django.db.models import Count
+from timetable.services import dashboard_stats
 
 
 def dashboard(request):
-    context = {
-        # Basic counts
-        "total_classes": AcademicClass.objects.count(),
-        "total_subjects": Subject.objects.count(),
-        "total_rooms": Room.objects.count(),
-        "total_batches": Batch.objects.count(),
-
-        # Timetable analytics
-        "total_entries": TimetableEntry.objects.count(),
-        "total_lectures": TimetableEntry.objects.filter(
-            is_break=False, batch__isnull=True
-        ).count(),
-        "total_practicals": TimetableEntry.objects.filter(
-            batch__isnull=False
-        ).count(),
-        "total_breaks": TimetableEntry.objects.filter(
-            is_break=True
-        ).count(),
-
-        # Day-wise load
-        "day_wise_load": Day.objects.annotate(
-            total=Count("timetableentry")
-        )
-    }
-
-    return render(request, "dashboard/dashboard.html", context)
+    return render(request, "dashboard/dashboard.html", dashboard_stats())
 
 
 def about(request):
@@ -107,22 +83,91 @@ def user_list_view(request):
     return render(request, 'users/user_list.html', {'users': users})
 
 
+CHAT_PAGE_SIZE = getattr(settings, 'CHAT_PAGE_SIZE', 50)
+
+
+def conversation_page(user, other_user, before=None):
+    """
+    One page of the conversation, oldest first, by keyset pagination on
+    (timestamp, id): `before` is the (timestamp, id) of the oldest message
+    already shown, None for the latest page. Returns the messages and the
+    cursor of the next older page (None if there is none).
+    """
+    conversation = Message.objects.filter(
+        Q(sender=user, receiver=other_user) | Q(sender=other_user, receiver=user)
+    )
+    if before:
+        timestamp, message_id = before
+        conversation = conversation.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+        )
+    page = list(
+        conversation.select_related('sender', 'receiver')
+        .order_by('-timestamp', '-id')[:CHAT_PAGE_SIZE + 1]
+    )
+    older = None
+    if len(page) > CHAT_PAGE_SIZE:
+        page = page[:CHAT_PAGE_SIZE]
+        older = urlencode({'before': page[-1].timestamp.isoformat(), 'before_id': page[-1].id})
+    page.reverse()
+    return page, older
+
+
+def _chat_cursor(request):
+    """
+    (timestamp, id) cursor from the query string, None if absent or invalid.
+    """
+    try:
+        timestamp = parse_datetime(request.GET.get('before', ''))
+        message_id = int(request.GET.get('before_id', ''))
+    except ValueError:
+        return None
+    if timestamp is None:
+        return None
+    return timestamp, message_id
+
+
 @login_required
 def chat_view_by_id(request, user_id):
     other_user = get_object_or_404(CustomUser, id=user_id)
-    messages = Message.objects.filter(
-        (Q(sender=request.user) & Q(receiver=other_user)) |
-        (Q(sender=other_user) & Q(receiver=request.user))
-    ).order_by('timestamp')
 
     if request.method == 'POST':
-        text = request.POST.get('text')
+        try:
+            text = message_text(request.POST.get('text'))
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
         image = request.FILES.get('image')
-        Message.objects.create(sender=request.user, receiver=other_user, text=text, image=image)
+        if not text and not image:
+            return redirect('chat', user_id=other_user.id)
+        message = Message.objects.create(sender=request.user, receiver=other_user, text=text, image=image)
+        schedule_thumbnail(message)
+        broadcast_message(message)
         return redirect('chat', user_id=other_user.id)  # ✅ Corrected: use user_id instead of username
 
+    messages, older = conversation_page(request.user, other_user, _chat_cursor(request))
     return render(request, 'users/chat.html', {
         'messages': messages,
+        'older': older,
+        'receiver': other_user,
+        'max_length': CHAT_MAX_MESSAGE_LENGTH,
+    })
+
+
+@login_required
+def chat_older_view(request, user_id):
+    """
+    The page of messages before the cursor, as an HTML fragment for the
+    "Load older messages" button.
+    """
+    other_user = get_object_or_404(CustomUser, id=user_id)
+    cursor = _chat_cursor(request)
+    if cursor is None:
+        return HttpResponseBadRequest("before and before_id are required")
+
+    messages, older = conversation_page(request.user, other_user, cursor)
+    return render(request, 'users/_chat_messages.html', {
+        'messages': messages,
+        'older': older,
         'receiver': other_user
     })
 
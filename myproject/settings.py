@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     
     'crispy_forms',
     'crispy_bootstrap5',
+    'channels',
 ]
 
 MIDDLEWARE = [
@@ -77,6 +79,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'
+
+# Channels: chat messages are pushed over websockets, which only an ASGI
+# server serves (e.g. daphne myproject.asgi:application); under the WSGI
+# runserver the chat falls back to posting the form. The in-memory layer
+# only reaches consumers in the same process; with several workers use a
+# shared layer, e.g. Redis (pip install channels-redis):
+# CHANNEL_LAYERS = {
+#     'default': {
+#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
+#         'CONFIG': {'hosts': [('127.0.0.1', 6379)]},
+#     },
+# }
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -151,6 +171,47 @@ LOGIN_REDIRECT_URL = 'base'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Class timetable generation
+# Engine: 'greedy' (randomized heuristic), 'multistart' (best of N seeded
+# greedy runs in a process pool) or 'cpsat' (OR-Tools CP-SAT solver)
+CLASS_TIMETABLE_ENGINE = 'greedy'
+CLASS_TIMETABLE_SOLVER_TIME_LIMIT = 10  # seconds per solve / multistart budget
+CLASS_TIMETABLE_SOLVER_WORKERS = 8
+CLASS_TIMETABLE_ATTEMPTS = 32  # greedy runs per 'multistart' generation
+CLASS_TIMETABLE_MULTISTART_PROCESSES = None  # size of the shared 'multistart' process pool; None = os.cpu_count()
+# Analytics / validation reports are cached per timetable version (seconds)
+CLASS_TIMETABLE_REPORT_CACHE_TIMEOUT = 3600
+# Rendered timetable grids are cached per timetable version (seconds)
+TIMETABLE_GRID_CACHE_TIMEOUT = 3600
+# iCalendar feeds: the weekly timetable repeats on every semester date
+# (ISO dates, inclusive) except the holidays. The dates belong to one term:
+# update them at the start of every semester, or override them with the
+# CLASS_TIMETABLE_SEMESTER_START / CLASS_TIMETABLE_SEMESTER_END environment
+# variables and CLASS_TIMETABLE_HOLIDAYS (comma-separated dates). Once the
+# semester has ended, subscribed calendars show no upcoming lectures.
+CLASS_TIMETABLE_SEMESTER_START = os.environ.get('CLASS_TIMETABLE_SEMESTER_START', '2026-07-01')
+CLASS_TIMETABLE_SEMESTER_END = os.environ.get('CLASS_TIMETABLE_SEMESTER_END', '2026-11-15')
+CLASS_TIMETABLE_HOLIDAYS = [
+    '2026-08-15',  # Independence Day
+    '2026-09-14',  # Ganesh Chaturthi
+    '2026-10-02',  # Gandhi Jayanti
+    '2026-11-08',  # Diwali
+]
+if 'CLASS_TIMETABLE_HOLIDAYS' in os.environ:
+    CLASS_TIMETABLE_HOLIDAYS = [
+        d.strip() for d in os.environ['CLASS_TIMETABLE_HOLIDAYS'].split(',') if d.strip()
+    ]
+CLASS_TIMETABLE_CALENDAR_CACHE_TIMEOUT = 3600
+# Dashboard counts: cleared on generation, short TTL for admin edits (seconds)
+DASHBOARD_CACHE_TIMEOUT = 60
+# Chat messages shown per page; older pages are loaded on demand
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_MESSAGE_LENGTH = 2000  # characters
+# Chat image thumbnails, made by Pillow in a background thread pool
+CHAT_THUMBNAIL_SIZE = (480, 480)  # bounding box, pixels
+CHAT_THUMBNAIL_QUALITY = 75  # JPEG
+CHAT_THUMBNAIL_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
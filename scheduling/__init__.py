@@ -0,0 +1,5 @@
+"""
+Scheduling code shared by the timetable apps (class_timetable,
+class_timetable_v2 and timetable). Not an installed app: it has no
+concrete models or migrations, so no app depends on another for it.
+"""
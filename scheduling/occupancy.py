@@ -0,0 +1,51 @@
+"""
+Teacher bookings across classes, shared by the timetable generators.
+
+Each teacher maps to a bitset with one bit per (day, slot) cell of the
+week, numbered as in rooms.cell_bit, so a conflict check is a dict lookup
+and an AND instead of a DB query. Teachers, days and slots are whatever
+keys the caller uses (Teacher ids or names, day names or Day ids, slot
+indexes or TimeSlot ids); the generators subclass TeacherOccupancy to load
+their own stored timetables.
+"""
+import copy
+
+from scheduling.rooms import cell_bit
+
+
+class TeacherOccupancy:
+    """
+    days / slots: the day and slot keys of the week, in order. Teachers in
+    `ignore` (e.g. None or placeholder names) are never booked, so any
+    number of them can share a cell.
+    """
+    def __init__(self, days, slots, ignore=(None,)):
+        self.busy = {}
+        self.ignore = ignore
+        self._day_index = {day: i for i, day in enumerate(days)}
+        self._slot_index = {slot: i for i, slot in enumerate(slots)}
+
+    def mask(self, day, slots):
+        day_index = self._day_index[day]
+        m = 0
+        for slot in slots:
+            m |= cell_bit(day_index, self._slot_index[slot], len(self._slot_index))
+        return m
+
+    def is_busy(self, teacher_list, day, slots):
+        """
+        Returns True if ANY teacher in the list is busy in any of the slots.
+        """
+        m = self.mask(day, slots)
+        return any(self.busy.get(t, 0) & m for t in teacher_list)
+
+    def occupy(self, teacher_list, day, slots):
+        m = self.mask(day, slots)
+        for t in teacher_list:
+            if t not in self.ignore:
+                self.busy[t] = self.busy.get(t, 0) | m
+
+    def copy(self):
+        other = copy.copy(self)
+        other.busy = dict(self.busy)
+        return other
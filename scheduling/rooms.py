@@ -0,0 +1,89 @@
+"""
+Room allocation: assigns rooms to timetable sessions without clashes.
+
+Cells are the (day, slot) positions of the week, numbered
+day_index * slots_per_day + slot_index, and every room keeps a bitset of
+the cells it is occupied in. Sessions are placed in order of their first
+cell, as in interval graph colouring; the sessions starting in the same
+cell form a bipartite matching between sessions and the rooms that suit
+them (type, capacity) and are free for every cell of the session, solved
+with augmenting paths. Rooms are tried smallest first, so large rooms stay
+free for large groups.
+"""
+from collections import namedtuple
+
+CLASSROOM = 'CLASSROOM'
+LAB = 'LAB'
+
+# key: returned in the allocation; cells: bitset of the cells it spans
+Session = namedtuple('Session', ['key', 'cells', 'size', 'room_type'])
+RoomSpec = namedtuple('RoomSpec', ['key', 'capacity', 'room_type'])
+
+def cell_bit(day_index, slot_index, slots_per_day):
+    return 1 << (day_index * slots_per_day + slot_index)
+
+def _augment(session, candidates, matched, seen):
+    # Kuhn's augmenting path: give `session` a room, moving the session
+    # holding it to another of its candidates if needed
+    for room in candidates[session]:
+        if room in seen:
+            continue
+        seen.add(room)
+        if room not in matched or _augment(matched[room], candidates, matched, seen):
+            matched[room] = session
+            return True
+    return False
+
+def allocate_rooms(rooms, sessions, occupancy=None):
+    """
+    Assigns a room to each session.
+
+    rooms: RoomSpecs; sessions: Sessions (keys must be unique);
+    occupancy: {room key: bitset} of cells already taken, e.g. by other
+    classes. Returns {session key: room key, or None if no suitable room
+    is free}.
+    """
+    occupancy = {room.key: (occupancy or {}).get(room.key, 0) for room in rooms}
+    rooms = sorted(rooms, key=lambda room: room.capacity)
+
+    starts = {}
+    for session in sessions:
+        first = session.cells & -session.cells
+        starts.setdefault(first, []).append(session)
+
+    allocation = {}
+    for first in sorted(starts):
+        group = {session.key: session for session in starts[first]}
+        candidates = {
+            key: [
+                room.key for room in rooms
+                if room.room_type == session.room_type
+                and room.capacity >= session.size
+                and not occupancy[room.key] & session.cells
+            ]
+            for key, session in group.items()
+        }
+
+        # Most constrained sessions first
+        matched = {}
+        for key in sorted(group, key=lambda key: len(candidates[key])):
+            _augment(key, candidates, matched, set())
+
+        for key in group:
+            allocation[key] = None
+        for room, key in matched.items():
+            allocation[key] = room
+            occupancy[room] |= group[key].cells
+    return allocation
+
+def no_room_warning(count):
+    """
+    Message for a generation that left `count` sessions without a room
+    (no free room of the right type and size), or None if all got one.
+    """
+    if not count:
+        return None
+    return (
+        f"{count} sessions got no room: add rooms in the admin "
+        "(practicals need LAB rooms that fit a batch)."
+    )
@@ -0,0 +1,39 @@
+"""
+Per-class version counters of the class timetable apps.
+"""
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class TimetableVersionBase(models.Model):
+    """
+    Per-class counter bumped whenever the timetable of the class changes;
+    pages, snapshots and cached reports are validated by it.
+    """
+    class_key = models.CharField(max_length=20, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.class_key} v{self.version}"
+
+    @classmethod
+    def bump(cls, *class_keys):
+        cls.objects.bulk_create(
+            [cls(class_key=key) for key in class_keys], ignore_conflicts=True
+        )
+        cls.objects.filter(class_key__in=class_keys).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+
+    @classmethod
+    def current(cls, class_key):
+        """
+        (version, updated_at) of the class; (0, None) if it never changed.
+        """
+        version = cls.objects.filter(class_key=class_key).values_list('version', 'updated_at').first()
+        return version or (0, None)
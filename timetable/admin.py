@@ -6,6 +6,7 @@ from .models import (
     Batch,
     Day,
     TimeSlot,
+    CurriculumItem,
     TimetableEntry
 )
 
@@ -15,3 +16,4 @@ admin.site.register(Room)
 admin.site.register(Batch)
 admin.site.register(Day)
 admin.site.register(TimeSlot)
+admin.site.register(CurriculumItem)
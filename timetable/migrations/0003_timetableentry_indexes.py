@@ -0,0 +1,25 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0002_timetableentry_is_extra'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetableentry',
+            index=models.Index(fields=['academic_class', 'day', 'time_slot'], name='tt_entry_class_slot_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('batch__isnull', False)), fields=('academic_class', 'day', 'time_slot', 'batch'), name='tt_entry_unique_batch_cell'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('batch__isnull', True)), fields=('academic_class', 'day', 'time_slot'), name='tt_entry_unique_class_cell'),
+        ),
+    ]
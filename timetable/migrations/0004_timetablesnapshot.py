@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0003_timetableentry_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grid', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('academic_class', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='timetable.academicclass')),
+            ],
+        ),
+    ]
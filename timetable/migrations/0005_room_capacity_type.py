@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0004_timetablesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicclass',
+            name='strength',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='capacity',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='room_type',
+            field=models.CharField(choices=[('CLASSROOM', 'Classroom'), ('LAB', 'Lab')], default='CLASSROOM', max_length=10),
+        ),
+    ]
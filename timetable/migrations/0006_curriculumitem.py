@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0005_room_capacity_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicclass',
+            name='batches',
+            field=models.ManyToManyField(blank=True, to='timetable.batch'),
+        ),
+        migrations.CreateModel(
+            name='CurriculumItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('teacher', models.CharField(blank=True, max_length=100)),
+                ('theory_hours', models.PositiveIntegerField(default=0)),
+                ('practical_sessions', models.PositiveIntegerField(default=0)),
+                ('academic_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='curriculum', to='timetable.academicclass')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable.subject')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('academic_class', 'subject'), name='tt_curriculum_unique_subject')],
+            },
+        ),
+    ]
@@ -5,6 +5,8 @@ class AcademicClass(models.Model):
     name = models.CharField(max_length=50)   # TYCO-A
     semester = models.CharField(max_length=10)  # SEM-V
     academic_year = models.CharField(max_length=20)  # 2025-26
+    strength = models.PositiveIntegerField(default=60)  # students, for room capacity
+    batches = models.ManyToManyField('Batch', blank=True)  # practical batches (A1, A2, A3)
 
     def __str__(self):
         return f"{self.name} ({self.semester})"
@@ -28,7 +30,14 @@ class Subject(models.Model):
 
 # 3. Room
 class Room(models.Model):
+    ROOM_TYPE = [
+        ('CLASSROOM', 'Classroom'),
+        ('LAB', 'Lab'),
+    ]
+
     room_number = models.CharField(max_length=10)  # CR-10, CR-11
+    capacity = models.PositiveIntegerField(default=60)
+    room_type = models.CharField(max_length=10, choices=ROOM_TYPE, default='CLASSROOM')  # practicals need a LAB
 
     def __str__(self):
         return self.room_number
@@ -59,7 +68,24 @@ class TimeSlot(models.Model):
         return f"{self.start_time} - {self.end_time}"
 
 
-# 7. Timetable Entry (Core Table)
+# 7. Curriculum: what generation schedules for a class
+class CurriculumItem(models.Model):
+    academic_class = models.ForeignKey(AcademicClass, on_delete=models.CASCADE, related_name='curriculum')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    teacher = models.CharField(max_length=100, blank=True)  # never double-booked across classes
+    theory_hours = models.PositiveIntegerField(default=0)  # lectures per week
+    practical_sessions = models.PositiveIntegerField(default=0)  # 2-hour blocks per batch per week
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['academic_class', 'subject'], name='tt_curriculum_unique_subject'),
+        ]
+
+    def __str__(self):
+        return f"{self.academic_class} - {self.subject}"
+
+
+# 8. Timetable Entry (Core Table)
 class TimetableEntry(models.Model):
     academic_class = models.ForeignKey(AcademicClass, on_delete=models.CASCADE)
     day = models.ForeignKey(Day, on_delete=models.CASCADE)
@@ -71,5 +97,35 @@ class TimetableEntry(models.Model):
     is_break = models.BooleanField(default=False)  # Lunch / Tea Break
     is_extra = models.BooleanField(default=False)  # Extra Lecture for filling gaps
 
+    class Meta:
+        indexes = [
+            # Loading / pivoting one class timetable
+            models.Index(fields=['academic_class', 'day', 'time_slot'], name='tt_entry_class_slot_idx'),
+        ]
+        constraints = [
+            # One practical row per batch in a (class, day, slot) cell
+            models.UniqueConstraint(
+                fields=['academic_class', 'day', 'time_slot', 'batch'],
+                condition=models.Q(batch__isnull=False),
+                name='tt_entry_unique_batch_cell',
+            ),
+            # One whole-class row (theory / break) per cell
+            models.UniqueConstraint(
+                fields=['academic_class', 'day', 'time_slot'],
+                condition=models.Q(batch__isnull=True),
+                name='tt_entry_unique_class_cell',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.day} | {self.time_slot}"
+
+
+# 9. Display grid of a class timetable, written at generation time
+class TimetableSnapshot(models.Model):
+    academic_class = models.OneToOneField(AcademicClass, on_delete=models.CASCADE, related_name='snapshot')
+    grid = models.JSONField()  # see services.build_display_grid
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.academic_class} snapshot"
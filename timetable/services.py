@@ -1,60 +1,245 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, Count, Q, Func, Value, CharField, IntegerField
 from timetable.models import (
-    AcademicClass, Day, TimeSlot, Subject,
-    Room, Batch, TimetableEntry
+    AcademicClass, Day, TimeSlot, Subject, CurriculumItem,
+    Room, Batch, TimetableEntry, TimetableSnapshot
 )
+from scheduling.occupancy import TeacherOccupancy as SharedTeacherOccupancy
+from scheduling.rooms import LAB, CLASSROOM, Session, RoomSpec, cell_bit, allocate_rooms, no_room_warning
+import math
 import random
 
-def generate_timetable(academic_class_id):
-    academic_class = AcademicClass.objects.get(id=academic_class_id)
-    
-    # 1. Setup Data
-    course_data = [
-        {"code": "OSY",  "th": 5, "pr_sessions": 1},
-        {"code": "STE",  "th": 4, "pr_sessions": 2},
-        {"code": "ENDS", "th": 1, "pr_sessions": 1},
-        {"code": "SPI",  "th": 0, "pr_sessions": 1}, 
-        {"code": "CLC",  "th": 4, "pr_sessions": 1}
-    ]
-    
-    # Batches
-    batch_names = ["A1", "A2", "A3"]
-    batches = []
-    for b_name in batch_names:
-        batch, _ = Batch.objects.get_or_create(name=b_name)
-        batches.append(batch)
-
-    # Subjects
-    subjects_map = {}
-    for item in course_data:
-        sub = Subject.objects.filter(code=item["code"]).first()
-        if not sub:
-            sub = Subject.objects.create(code=item["code"], name=item["code"], subject_type="THEORY")
-        subjects_map[item["code"]] = sub
-
-    # Rooms
+# Curriculum and batches given to classes that have none yet
+DEFAULT_COURSE_DATA = [
+    {"code": "OSY",  "th": 5, "pr_sessions": 1},
+    {"code": "STE",  "th": 4, "pr_sessions": 2},
+    {"code": "ENDS", "th": 1, "pr_sessions": 1},
+    {"code": "SPI",  "th": 0, "pr_sessions": 1}, 
+    {"code": "CLC",  "th": 4, "pr_sessions": 1}
+]
+DEFAULT_BATCHES = ["A1", "A2", "A3"]
+
+
+class TeacherOccupancy(SharedTeacherOccupancy):
+    """
+    Teacher bookings keyed by the free-text CurriculumItem.teacher, in Day
+    and TimeSlot ids; a blank teacher is never booked.
+    """
+    def __init__(self, days, slots):
+        super().__init__([d.id for d in days], [s.id for s in slots], ignore=("", None))
+
+    @classmethod
+    def from_other_classes(cls, academic_class, days, slots):
+        """
+        Loads the bookings of every other class (two queries).
+        """
+        occupancy = cls(days, slots)
+        teachers = {
+            (class_id, subject_id): teacher
+            for class_id, subject_id, teacher in CurriculumItem.objects.exclude(
+                academic_class=academic_class
+            ).exclude(teacher="").values_list("academic_class_id", "subject_id", "teacher")
+        }
+        entries = TimetableEntry.objects.exclude(academic_class=academic_class).filter(
+            subject__isnull=False
+        ).values_list("academic_class_id", "subject_id", "day_id", "time_slot_id")
+        for class_id, subject_id, day_id, slot_id in entries:
+            teacher = teachers.get((class_id, subject_id))
+            if teacher:
+                occupancy.occupy([teacher], day_id, [slot_id])
+        return occupancy
+
+
+def load_classes(academic_classes):
+    """
+    Classes of the queryset with their curriculum (and subjects) and
+    batches prefetched; classes without them get the defaults first.
+    """
+    def load():
+        return list(academic_classes.prefetch_related(
+            Prefetch("curriculum", queryset=CurriculumItem.objects.select_related("subject").order_by("id")),
+            Prefetch("batches", queryset=Batch.objects.order_by("name")),
+        ))
+
+    classes = load()
+    if upsert_defaults(classes):
+        classes = load()
+    return classes
+
+
+def upsert_defaults(classes):
+    """
+    Gives DEFAULT_COURSE_DATA / DEFAULT_BATCHES to the classes that have no
+    curriculum / batches, creating missing Subjects and Batches, all in
+    bulk. Returns True if anything was written.
+    """
+    need_curriculum = [c for c in classes if not c.curriculum.all()]
+    need_batches = [c for c in classes if not c.batches.all()]
+    if not need_curriculum and not need_batches:
+        return False
+
+    with transaction.atomic():
+        if need_curriculum:
+            codes = [item["code"] for item in DEFAULT_COURSE_DATA]
+            subjects = {}
+            for sub in Subject.objects.filter(code__in=codes).order_by("id"):
+                subjects.setdefault(sub.code, sub)
+            missing = [
+                Subject(code=code, name=code, subject_type="THEORY")
+                for code in codes if code not in subjects
+            ]
+            for sub in Subject.objects.bulk_create(missing):
+                subjects[sub.code] = sub
+
+            CurriculumItem.objects.bulk_create(
+                [
+                    CurriculumItem(
+                        academic_class=c, subject=subjects[item["code"]],
+                        theory_hours=item["th"], practical_sessions=item["pr_sessions"],
+                    )
+                    for c in need_curriculum for item in DEFAULT_COURSE_DATA
+                ],
+                update_conflicts=True,
+                unique_fields=["academic_class", "subject"],
+                update_fields=["theory_hours", "practical_sessions"],
+            )
+
+        if need_batches:
+            batches = {}
+            for batch in Batch.objects.filter(name__in=DEFAULT_BATCHES).order_by("id"):
+                batches.setdefault(batch.name, batch)
+            missing = [Batch(name=name) for name in DEFAULT_BATCHES if name not in batches]
+            for batch in Batch.objects.bulk_create(missing):
+                batches[batch.name] = batch
+
+            Through = AcademicClass.batches.through
+            Through.objects.bulk_create(
+                [
+                    Through(academicclass_id=c.id, batch_id=batches[name].id)
+                    for c in need_batches for name in DEFAULT_BATCHES
+                ],
+                ignore_conflicts=True,
+            )
+    return True
+
+
+def load_week():
+    """
+    Days, time slots and rooms shared by every class.
+    """
     rooms = list(Room.objects.all())
     if not rooms:
         rooms = [Room.objects.create(room_number="CR-1")]
 
     days = list(Day.objects.all())
     all_slots = list(TimeSlot.objects.all().order_by("start_time"))
-    
-    # Clear Old Data
-    TimetableEntry.objects.filter(academic_class=academic_class).delete()
+    return days, all_slots, rooms
+
+
+def generate_timetable(academic_class_id):
+    """
+    Regenerates one AcademicClass against the stored timetables of the
+    others. Returns the no_room_warning of the run, or None.
+    """
+    classes = load_classes(AcademicClass.objects.filter(id=academic_class_id))
+    if not classes:
+        raise AcademicClass.DoesNotExist(f"AcademicClass {academic_class_id} does not exist")
+    academic_class = classes[0]
+
+    days, all_slots, rooms = load_week()
+    occupancy = TeacherOccupancy.from_other_classes(academic_class, days, all_slots)
+    new_entries, sessions = schedule_class(academic_class, days, all_slots, occupancy)
+
+    # Rooms: free across all classes
+    unroomed = assign_rooms(
+        sessions, rooms, days, all_slots,
+        others=TimetableEntry.objects.exclude(academic_class=academic_class),
+    )
+
+    # --- SAVE: replace the old timetable in a single transaction ---
+    with transaction.atomic():
+        TimetableEntry.objects.filter(academic_class=academic_class).delete()
+        TimetableEntry.objects.bulk_create(new_entries)
+        save_display_grid(academic_class, new_entries, days, all_slots)
+        transaction.on_commit(clear_dashboard_stats)
+    return no_room_warning(unroomed)
+
+
+def generate_all():
+    """
+    Regenerates every AcademicClass in one run: classes are placed one
+    after another (in random order) against a shared teacher occupancy,
+    rooms are matched over all classes at once and every timetable is
+    written in one transaction. Returns (number of classes, the
+    no_room_warning of the run or None).
+    """
+    classes = load_classes(AcademicClass.objects.all())
+    random.shuffle(classes)
+    days, all_slots, rooms = load_week()
+    occupancy = TeacherOccupancy(days, all_slots)
+
+    entries_by_class = {}
+    all_sessions = []
+    for academic_class in classes:
+        entries, sessions = schedule_class(academic_class, days, all_slots, occupancy)
+        entries_by_class[academic_class] = entries
+        all_sessions.extend(sessions)
+
+    unroomed = assign_rooms(all_sessions, rooms, days, all_slots)
+
+    with transaction.atomic():
+        TimetableEntry.objects.all().delete()
+        TimetableEntry.objects.bulk_create(
+            [entry for entries in entries_by_class.values() for entry in entries]
+        )
+        for academic_class, entries in entries_by_class.items():
+            save_display_grid(academic_class, entries, days, all_slots)
+        transaction.on_commit(clear_dashboard_stats)
+    return len(classes), no_room_warning(unroomed)
+
+
+def schedule_class(academic_class, days, all_slots, occupancy):
+    """
+    Builds the (unsaved) timetable entries of one class from its prefetched
+    curriculum and batches, booking its teachers in `occupancy`.
+    Returns (entries, sessions) where sessions are the (entries, group
+    size, room type) tuples to give a room.
+    """
+    curriculum = list(academic_class.curriculum.all())
+    batches = list(academic_class.batches.all())
+    teacher_of = {item.subject_id: item.teacher for item in curriculum}
+
+    # Entries are collected here and written in one go at the end.
+    # `occupied` holds the (day_id, slot_id) cells already taken.
+    # `sessions` holds (entries, group size, room type) to give a room.
+    new_entries = []
+    occupied = set()
+    sessions = []
+    batch_size = math.ceil(academic_class.strength / len(batches))
+
+    def add_entry(day, slot, **fields):
+        occupied.add((day.id, slot.id))
+        entry = TimetableEntry(
+            academic_class=academic_class, day=day, time_slot=slot, **fields
+        )
+        new_entries.append(entry)
+        return entry
 
     # --- PHASE 1: PREPARE PRACTICAL TRIPLETS ---
     batch_buckets = {b.name: [] for b in batches}
     for b in batches:
-        for item in course_data:
-            for _ in range(item["pr_sessions"]):
-                batch_buckets[b.name].append(subjects_map[item["code"]])
+        for item in curriculum:
+            for _ in range(item.practical_sessions):
+                batch_buckets[b.name].append(item.subject)
     
     practical_blocks = [] # List of {batch: subject} dicts
     
     for k in batch_buckets:
         random.shuffle(batch_buckets[k])
         
-    max_sessions = 6 
+    max_sessions = max(len(bucket) for bucket in batch_buckets.values()) 
     
     for _ in range(max_sessions):
         block_assignment = {}
@@ -96,33 +281,25 @@ def generate_timetable(academic_class_id):
     
     for assignment in practical_blocks:
         placed = False
+        teachers = [teacher_of[sub.id] for sub in assignment.values()]
         for i, (day, s_pair) in enumerate(block_candidates):
-            collision = False
-            for s in s_pair:
-                if TimetableEntry.objects.filter(academic_class=academic_class, day=day, time_slot=s).exists():
-                    collision = True; break
+            cells = [(day.id, s.id) for s in s_pair]
+            collision = any(cell in occupied for cell in cells)
             
-            if not collision:
+            if not collision and not occupancy.is_busy(teachers, day.id, [s.id for s in s_pair]):
                 for batch, sub in assignment.items():
-                    r = random.choice(rooms) 
-                    for s in s_pair:
-                         TimetableEntry.objects.create(
-                            academic_class=academic_class,
-                            day=day,
-                            time_slot=s,
-                            subject=sub,
-                            room=r,
-                            batch=batch
-                        )
+                    block = [add_entry(day, s, subject=sub, batch=batch) for s in s_pair]
+                    sessions.append((block, batch_size, LAB))
+                occupancy.occupy(teachers, day.id, [s.id for s in s_pair])
                 block_candidates.pop(i)
                 placed = True
                 break
     
     # --- PHASE 3: THEORY ---
     theory_tasks = []
-    for item in course_data:
-        for _ in range(item["th"]):
-            theory_tasks.append(subjects_map[item["code"]])
+    for item in curriculum:
+        for _ in range(item.theory_hours):
+            theory_tasks.append(item.subject)
     random.shuffle(theory_tasks)
     
     single_candidates = []
@@ -136,50 +313,233 @@ def generate_timetable(academic_class_id):
         placed = False
         for day, slot in single_candidates:
             if placed: break
-            if TimetableEntry.objects.filter(academic_class=academic_class, day=day, time_slot=slot).exists():
+            if (day.id, slot.id) in occupied:
+                continue
+            if occupancy.is_busy([teacher_of[sub.id]], day.id, [slot.id]):
                 continue
                 
-            r = random.choice(rooms)
-            TimetableEntry.objects.create(
-                academic_class=academic_class,
-                day=day,
-                time_slot=slot,
-                subject=sub,
-                room=r,
-                batch=None
-            )
+            entry = add_entry(day, slot, subject=sub, batch=None)
+            sessions.append(([entry], academic_class.strength, CLASSROOM))
+            occupancy.occupy([teacher_of[sub.id]], day.id, [slot.id])
             placed = True
 
     # --- PHASE 4: FILL BREAKS ---
     for day in days:
         for slot in all_slots:
             if is_break(slot):
-                 if not TimetableEntry.objects.filter(academic_class=academic_class, day=day, time_slot=slot, is_break=True).exists():
-                     TimetableEntry.objects.create(
-                        academic_class=academic_class,
-                        day=day,
-                        time_slot=slot,
-                        is_break=True
-                     )
+                 if (day.id, slot.id) not in occupied:
+                     add_entry(day, slot, is_break=True)
 
     # --- PHASE 5: FILL GAPS WITH EXTRA LECTURES ---
-    available_subjects = list(subjects_map.values())
+    subjects = [item.subject for item in curriculum]
     
     for day in days:
         for slot in all_slots:
             if is_break(slot): continue
             
-            if not TimetableEntry.objects.filter(academic_class=academic_class, day=day, time_slot=slot).exists():
+            if (day.id, slot.id) not in occupied:
+                 # Only subjects whose teacher is free at this time
+                 available_subjects = [
+                     sub for sub in subjects
+                     if not occupancy.is_busy([teacher_of[sub.id]], day.id, [slot.id])
+                 ]
                  if available_subjects:
                      sub = random.choice(available_subjects)
-                     r = rooms[0]
                      
-                     TimetableEntry.objects.create(
-                        academic_class=academic_class,
-                        day=day,
-                        time_slot=slot,
-                        subject=sub,
-                        room=r,
-                        batch=None, 
-                        is_extra=True # Mark as extra
-                     )
+                     entry = add_entry(day, slot, subject=sub, batch=None, is_extra=True) # Mark as extra
+                     sessions.append(([entry], academic_class.strength, CLASSROOM))
+                     occupancy.occupy([teacher_of[sub.id]], day.id, [slot.id])
+
+    return new_entries, sessions
+
+
+def assign_rooms(sessions, rooms, days, slots, others=None):
+    """
+    Sets the room of every entry of `sessions` ((entries, group size, room
+    type) tuples), avoiding the rooms `others` (entries of other classes)
+    use at the same time. Entries left without a suitable free room keep
+    room=None. Returns the number of sessions left without a room.
+    """
+    day_index = {d.id: i for i, d in enumerate(days)}
+    slot_index = {s.id: i for i, s in enumerate(slots)}
+
+    def cells(day_id, slot_id):
+        return cell_bit(day_index[day_id], slot_index[slot_id], len(slots))
+
+    occupancy = {}
+    if others is not None:
+        taken = others.filter(room__isnull=False).values_list('room_id', 'day_id', 'time_slot_id')
+        for room_id, day_id, slot_id in taken:
+            occupancy[room_id] = occupancy.get(room_id, 0) | cells(day_id, slot_id)
+
+    allocation = allocate_rooms(
+        [RoomSpec(r.id, r.capacity, r.room_type) for r in rooms],
+        [
+            Session(i, sum(cells(e.day_id, e.time_slot_id) for e in entries), size, room_type)
+            for i, (entries, size, room_type) in enumerate(sessions)
+        ],
+        occupancy,
+    )
+    rooms_by_id = {r.id: r for r in rooms}
+    for i, (entries, _, _) in enumerate(sessions):
+        for e in entries:
+            e.room = rooms_by_id.get(allocation[i])
+    return sum(1 for room in allocation.values() if room is None)
+
+
+def _entry_label(entry):
+    # Single entry: "OSY - T", "OSY - E" for extras, or just the code (LIB)
+    code = entry.subject.code if entry.subject else ""
+    if entry.is_extra:
+        return f"{code} - E"
+    if entry.subject and code != "LIB":
+        return f"{code} - {entry.subject.subject_type[:1]}"
+    return code
+
+
+def build_display_grid(entries, days, slots):
+    """
+    Pivots timetable entries into the JSON grid rendered by
+    view_timetable.html: one row per slot (common breaks collapsed into a
+    break row) and one cell per day, merging two consecutive slots that hold
+    the same practical batches into one cell (rowspan 2).
+    """
+    # Map: day_id -> slot_id -> list of entries
+    data_map = {d.id: {s.id: [] for s in slots} for d in days}
+    for e in entries:
+        data_map[e.day_id][e.time_slot_id].append(e)
+
+    # Calculate Merges (Rowspans)
+    merged_info = {d.id: {s.id: {'rowspan': 1, 'skipped': False} for s in slots} for d in days}
+
+    for d in days:
+        for i in range(len(slots) - 1):
+            entries_curr = data_map[d.id][slots[i].id]
+            entries_next = data_map[d.id][slots[i + 1].id]
+
+            if entries_curr and entries_next:
+                if not entries_curr[0].is_break and not entries_next[0].is_break:
+                    # Merge a batch practical block (entries > 1) with the same batches and subjects
+                    if len(entries_curr) > 1 and len(entries_next) > 1:
+                        curr_set = set((e.batch_id, e.subject_id) for e in entries_curr)
+                        next_set = set((e.batch_id, e.subject_id) for e in entries_next)
+                        if curr_set == next_set and not merged_info[d.id][slots[i].id]['skipped']:
+                            merged_info[d.id][slots[i].id]['rowspan'] = 2
+                            merged_info[d.id][slots[i + 1].id]['skipped'] = True
+
+    rows = []
+    for slot in slots:
+        cells = []
+        for day in days:
+            cell_entries = data_map[day.id][slot.id]
+            info = merged_info[day.id][slot.id]
+            cells.append({
+                'entries': [
+                    {
+                        'batch': str(e.batch),
+                        'code': e.subject.code if e.subject else "",
+                        'label': _entry_label(e),
+                    }
+                    for e in cell_entries
+                ],
+                'rowspan': info['rowspan'],
+                'skipped': info['skipped'],
+                'is_break': bool(cell_entries and cell_entries[0].is_break),
+            })
+        rows.append({
+            'label': f"{slot.start_time.strftime('%I:%M %p').lower()} to {slot.end_time.strftime('%I:%M %p').lower()}",
+            # Every day has a break in this slot
+            'is_break': bool(cells) and all(c['is_break'] for c in cells),
+            'cells': cells,
+        })
+
+    return {'days': [d.name for d in days], 'rows': rows}
+
+
+def save_display_grid(academic_class, entries, days, slots):
+    grid = build_display_grid(entries, days, slots)
+    TimetableSnapshot.objects.update_or_create(academic_class=academic_class, defaults={'grid': grid})
+    return grid
+
+
+def load_display_grid(academic_class):
+    """
+    Display grid of the class; timetables generated before snapshots
+    existed get their snapshot built here, once.
+    """
+    grid = TimetableSnapshot.objects.filter(academic_class=academic_class).values_list('grid', flat=True).first()
+    if grid is None:
+        entries = TimetableEntry.objects.filter(
+            academic_class=academic_class
+        ).select_related('subject', 'batch')
+        days = list(Day.objects.all())
+        slots = list(TimeSlot.objects.all().order_by("start_time"))
+        grid = save_display_grid(academic_class, list(entries), days, slots)
+    return grid
+
+
+def display_grid_version(academic_class_id):
+    """
+    When the display grid of the class was last written, None if it has no
+    snapshot yet; the timetable page is validated and cached by it.
+    """
+    return TimetableSnapshot.objects.filter(
+        academic_class_id=academic_class_id
+    ).values_list('created_at', flat=True).first()
+
+
+# --- Dashboard ---
+DASHBOARD_STATS_CACHE_KEY = 'timetable:dashboard_stats'
+
+
+def _table_count(model, label):
+    # COUNT as a plain function keeps the query ungrouped, one row per table
+    return model.objects.order_by().values(
+        table=Value(label, output_field=CharField()),
+        total=Func('pk', function='COUNT', output_field=IntegerField()),
+    )
+
+
+def dashboard_stats():
+    """
+    Counts shown on the dashboard, cached for DASHBOARD_CACHE_TIMEOUT
+    seconds and cleared when timetables are generated.
+
+    Two queries: the table sizes in one UNION ALL, and the entry counts by
+    conditional aggregation in the day-wise load query.
+    """
+    stats = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if stats is not None:
+        return stats
+
+    tables = _table_count(AcademicClass, 'classes').union(
+        _table_count(Subject, 'subjects'),
+        _table_count(Room, 'rooms'),
+        _table_count(Batch, 'batches'),
+        all=True,
+    )
+    stats = {f"total_{row['table']}": row['total'] for row in tables}
+
+    day_wise_load = list(Day.objects.annotate(
+        total=Count("timetableentry"),
+        lectures=Count("timetableentry", filter=Q(
+            timetableentry__is_break=False, timetableentry__batch__isnull=True
+        )),
+        practicals=Count("timetableentry", filter=Q(timetableentry__batch__isnull=False)),
+        breaks=Count("timetableentry", filter=Q(timetableentry__is_break=True)),
+    ).values("name", "total", "lectures", "practicals", "breaks"))
+
+    # Every entry has a day, so the day totals add up to the table totals
+    stats.update({
+        "total_entries": sum(day["total"] for day in day_wise_load),
+        "total_lectures": sum(day["lectures"] for day in day_wise_load),
+        "total_practicals": sum(day["practicals"] for day in day_wise_load),
+        "total_breaks": sum(day["breaks"] for day in day_wise_load),
+        "day_wise_load": day_wise_load,
+    })
+    cache.set(DASHBOARD_STATS_CACHE_KEY, stats, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return stats
+
+
+def clear_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
@@ -1,3 +1,60 @@
-from django.test import TestCase
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from scheduling.rooms import CLASSROOM, LAB, RoomSpec, Session, allocate_rooms, cell_bit
+
+
+class AllocateRoomsTests(SimpleTestCase):
+    def test_no_double_booking_and_rooms_fit(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            rooms = [
+                RoomSpec(f"R{i}", rng.choice([30, 60, 90]), rng.choice([CLASSROOM, LAB]))
+                for i in range(rng.randrange(1, 6))
+            ]
+            occupancy = {room.key: rng.getrandbits(12) & rng.getrandbits(12) for room in rooms}
+            sessions = []
+            for i in range(rng.randrange(1, 12)):
+                start = rng.randrange(11)
+                cells = cell_bit(0, start, 12)
+                if rng.random() < 0.5:
+                    cells |= cell_bit(0, start + 1, 12)
+                sessions.append(Session(i, cells, rng.choice([20, 60, 80]), rng.choice([CLASSROOM, LAB])))
+
+            allocation = allocate_rooms(rooms, sessions, occupancy)
+
+            self.assertEqual(set(allocation), {session.key for session in sessions})
+            specs = {room.key: room for room in rooms}
+            used = dict(occupancy)
+            for session in sorted(sessions, key=lambda session: session.key):
+                room = allocation[session.key]
+                if room is None:
+                    continue
+                self.assertEqual(specs[room].room_type, session.room_type)
+                self.assertGreaterEqual(specs[room].capacity, session.size)
+                self.assertFalse(used[room] & session.cells, f"{room} double-booked")
+                used[room] |= session.cells
+
+    def test_smallest_fitting_room_first(self):
+        rooms = [RoomSpec('big', 90, CLASSROOM), RoomSpec('small', 40, CLASSROOM)]
+        sessions = [Session('a', cell_bit(0, 0, 6), 30, CLASSROOM), Session('b', cell_bit(0, 0, 6), 80, CLASSROOM)]
+        self.assertEqual(allocate_rooms(rooms, sessions), {'a': 'small', 'b': 'big'})
+
+    def test_matching_moves_sessions_to_serve_more(self):
+        # 'x' fits both rooms, 'y' only the large one: both get a room
+        rooms = [RoomSpec('small', 40, CLASSROOM), RoomSpec('large', 80, CLASSROOM)]
+        sessions = [Session('x', cell_bit(1, 2, 6), 30, CLASSROOM), Session('y', cell_bit(1, 2, 6), 70, CLASSROOM)]
+        allocation = allocate_rooms(rooms, sessions)
+        self.assertEqual(allocation, {'x': 'small', 'y': 'large'})
+
+    def test_lab_sessions_need_a_lab(self):
+        rooms = [RoomSpec('CR-1', 60, CLASSROOM)]
+        sessions = [Session('lab', cell_bit(0, 0, 6) | cell_bit(0, 1, 6), 20, LAB)]
+        self.assertEqual(allocate_rooms(rooms, sessions), {'lab': None})
+
+    def test_occupied_rooms_are_skipped(self):
+        rooms = [RoomSpec('CR-1', 60, CLASSROOM), RoomSpec('CR-2', 60, CLASSROOM)]
+        sessions = [Session('s', cell_bit(0, 3, 6), 60, CLASSROOM)]
+        occupancy = {'CR-1': cell_bit(0, 3, 6)}
+        self.assertEqual(allocate_rooms(rooms, sessions, occupancy), {'s': 'CR-2'})
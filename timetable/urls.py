@@ -9,6 +9,7 @@ from .views import *
 
 urlpatterns = [
     path("generate/<int:class_id>/", generate_timetable_view, name="generate_timetable"),
+    path("generate-all/", generate_all_view, name="generate_all_timetables"),
     path("view/<int:class_id>/", view_timetable, name="view_timetable"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
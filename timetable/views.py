@@ -1,96 +1,66 @@
+from django.conf import settings
+from django.contrib import messages
 from django.shortcuts import render, redirect
-from .models import AcademicClass, Day, TimeSlot, TimetableEntry
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import AcademicClass
 
 def generate_timetable_view(request, class_id):
     from .services import generate_timetable
-    generate_timetable(class_id)
+    warning = generate_timetable(class_id)
+    if warning:
+        messages.warning(request, warning)
     return redirect("view_timetable", class_id=class_id)
 
-def view_timetable(request, class_id):
-    academic_class = AcademicClass.objects.get(id=class_id)
-    days = Day.objects.all()
-    slots = list(TimeSlot.objects.all().order_by("start_time"))
+def generate_all_view(request):
+    from .services import generate_all
+    count, warning = generate_all()
+    messages.success(request, f"Timetables generated for {count} classes")
+    if warning:
+        messages.warning(request, warning)
+    return redirect("dashboard")
+
+def _page_version(request, class_id):
+    # Looked up once per request, for the validators and the view
+    if not hasattr(request, 'timetable_version'):
+        from .services import display_grid_version
+        request.timetable_version = display_grid_version(class_id)
+    return request.timetable_version
 
-    # Need to verify if context is passed correctly
-    all_entries = TimetableEntry.objects.filter(academic_class=academic_class).select_related('subject', 'batch', 'time_slot', 'day')
-    
-    # Map: day_id -> slot_id -> list of entries
-    data_map = {d.id: {s.id: [] for s in slots} for d in days}
-    for e in all_entries:
-        data_map[e.day_id][e.time_slot_id].append(e)
+def _page_etag(request, class_id):
+    version = _page_version(request, class_id)
+    # Pages with pending flash messages are always rendered in full
+    if version is None or len(messages.get_messages(request)):
+        return None
+    # The page header shows the logged-in user
+    return f"{class_id}-{version.timestamp()}-{request.user.pk or 0}"
 
-    # Calculate Merges (Rowspans)
-    merged_info = {d.id: {s.id: {'rowspan': 1, 'skipped': False} for s in slots} for d in days}
-    
-    for d in days:
-        for i in range(len(slots) - 1):
-            s_curr = slots[i]
-            s_next = slots[i+1]
-            
-            entries_curr = data_map[d.id][s_curr.id]
-            entries_next = data_map[d.id][s_next.id]
-            
-            # Check merge conditions
-            if entries_curr and entries_next:
-                if not entries_curr[0].is_break and not entries_next[0].is_break:
-                    # Merge if it's a batch practical block (entries > 1) 
-                    # OR same single subject (Theory block)
-                    should_merge = False
-                    
-                    if len(entries_curr) > 1 and len(entries_next) > 1:
-                        curr_set = set((e.batch_id, e.subject_id) for e in entries_curr)
-                        next_set = set((e.batch_id, e.subject_id) for e in entries_next)
-                        if curr_set == next_set:
-                            should_merge = True
-                    
-                    # Optional: Merge theory if same subject? (Usually not requested but good for 2hr lectures)
-                    # if len(entries_curr) == 1 and len(entries_next) == 1:
-                    #     if entries_curr[0].subject_id == entries_next[0].subject_id and entries_curr[0].subject_id:
-                    #          should_merge = True
+def _page_last_modified(request, class_id):
+    if len(messages.get_messages(request)):
+        return None
+    return _page_version(request, class_id)
 
-                    if should_merge and not merged_info[d.id][s_curr.id]['skipped']:
-                         merged_info[d.id][s_curr.id]['rowspan'] = 2
-                         merged_info[d.id][s_next.id]['skipped'] = True
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_page_etag, last_modified_func=_page_last_modified)
+def view_timetable(request, class_id):
+    from .services import load_display_grid, display_grid_version
+    academic_class = AcademicClass.objects.get(id=class_id)
 
-    # Build Grid for Template
-    timetable_grid = []
-    unique_subjects = set()
-    
-    for slot in slots:
-        row_data = {}
-        for day in days:
-            entries = data_map[day.id][slot.id]
-            info = merged_info[day.id][slot.id]
-            
-            for e in entries:
-                if e.subject: unique_subjects.add(e.subject)
-            
-            row_data[day] = {
-                'entries': entries,
-                'rowspan': info['rowspan'],
-                'skipped': info['skipped'],
-                'is_break': bool(entries and entries[0].is_break)
-            }
-        timetable_grid.append((slot, row_data))
-        
-    break_slots = {}
-    for slot, row in timetable_grid:
-        all_break = True
-        has_data = False
-        for day in days:
-             if row[day]['entries']: has_data = True
-             if not row[day]['is_break']:
-                 all_break = False
-        if not has_data: all_break = False
-        break_slots[slot] = all_break
+    # Precomputed when the timetable was generated; only loaded when the
+    # rendered grid of this version is not cached
+    version = _page_version(request, class_id)
+    if version is None:
+        # Generated before snapshots existed: build it now
+        load_display_grid(academic_class)
+        version = display_grid_version(class_id)
+    grid = SimpleLazyObject(lambda: load_display_grid(academic_class))
 
     context = {
         "academic_class": academic_class,
-        "days": days,
-        "slots": slots,
-        "timetable_grid": timetable_grid,
-        "break_slots": break_slots,
-        "unique_subjects": sorted(list(unique_subjects), key=lambda s: s.code)
+        "grid": grid,
+        "version": version.timestamp(),
+        "grid_cache_timeout": getattr(settings, 'TIMETABLE_GRID_CACHE_TIMEOUT', 3600),
     }
 
     return render(request, "timetable/view_timetable.html", context)